@@ -1,17 +1,93 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.cache import user_cache
+from projects import metrics
 
 
 class CustomJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        # Chaque issue de l'authentification est comptée dans les métriques
+        try:
+            user_auth_tuple = super().authenticate(request)
+        except InvalidToken:
+            metrics.count_jwt(metrics.INVALID_TOKEN)
+            raise
+        except AuthenticationFailed:
+            metrics.count_jwt(metrics.REJECTED)
+            raise
+        metrics.count_jwt(metrics.NO_TOKEN if user_auth_tuple is None else metrics.AUTHENTICATED)
+        return user_auth_tuple
+
     def get_user(self, validated_token):
-        # Appel de la méthode get_user de la classe parente pour obtenir l'utilisateur à partir du jeton validé
-        user = super().get_user(validated_token)
-        
+        # L'utilisateur est d'abord cherché dans le cache, invalidé à chaque modification du User
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cached = user_cache.get(user_id) if user_id is not None else None
+
+        if cached is None:
+            # Appel de la méthode get_user de la classe parente pour obtenir l'utilisateur à partir du jeton validé
+            user = super().get_user(validated_token)
+            self.check_user(user, user_cache.password_hash(user), validated_token)
+            # Si l'utilisateur est valide, il est mis en cache puis retourné
+            user_cache.set(user)
+            return user
+
+        user, password_hash = cached
+        self.check_user(user, password_hash, validated_token)
+        return user
+
+    def check_user(self, user, password_hash, validated_token):
+        """Les vérifications de JWTAuthentication.get_user, refaites sur l'utilisateur en cache"""
         # Vérifie si l'utilisateur est actif
         if not user.is_active:
             # Si l'utilisateur est inactif, une exception AuthenticationFailed est levée
-            raise AuthenticationFailed('User is inactive')
-        
-        # Si l'utilisateur est actif, il est retourné
-        return user
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        # Le jeton est révoqué par un changement de mot de passe
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_hash:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
 
+    async def aauthenticate(self, request):
+        """authenticate() pour les vues asynchrones, l'utilisateur est chargé avec l'ORM async"""
+        try:
+            user_auth_tuple = await self._aauthenticate(request)
+        except InvalidToken:
+            metrics.count_jwt(metrics.INVALID_TOKEN)
+            raise
+        except AuthenticationFailed:
+            metrics.count_jwt(metrics.REJECTED)
+            raise
+        metrics.count_jwt(metrics.NO_TOKEN if user_auth_tuple is None else metrics.AUTHENTICATED)
+        return user_auth_tuple
+
+    async def _aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cached = await user_cache.aget(user_id)
+        if cached is not None:
+            user, password_hash = cached
+            self.check_user(user, password_hash, validated_token)
+            return user
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        self.check_user(user, user_cache.password_hash(user), validated_token)
+        await user_cache.aset(user)
+        return user
@@ -0,0 +1,90 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from projects.metrics import count_cache_lookup
+
+USER_CACHE_ALIAS = 'users'
+# What the authentication and the permissions read on request.user
+CACHED_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+class UserCache:
+    """
+    Cache of the authenticated users keyed by id, stored in the bounded
+    'users' cache (MAX_ENTRIES / TIMEOUT in settings.CACHES). Entries are
+    invalidated by the User signals, hit/miss counters are kept per process.
+
+    The cache may be shared, so an entry only holds CACHED_FIELDS and the
+    md5 of the password hash that simplejwt compares to the token, never the
+    password hash itself. `get` returns the user rebuilt from them, its other
+    fields deferred, with that md5.
+    """
+
+    def __init__(self, alias=USER_CACHE_ALIAS):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, user_id):
+        return f'user:{user_id}'
+
+    def _count(self, user):
+        count_cache_lookup(self.alias, user)
+        with self._lock:
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return user
+
+    def password_hash(self, user):
+        return get_md5_hash_password(user.password)
+
+    def entry(self, user):
+        return {name: getattr(user, name) for name in CACHED_FIELDS}, self.password_hash(user)
+
+    def load(self, entry):
+        if entry is None:
+            return None
+        fields, password_hash = entry
+        User = get_user_model()
+        # from_db() expects the values in the order of the model fields
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+        return User.from_db(router.db_for_read(User), names, [fields[name] for name in names]), password_hash
+
+    def get(self, user_id):
+        """Return (user, password md5) or None."""
+        return self.load(self._count(self.cache.get(self.key(user_id))))
+
+    async def aget(self, user_id):
+        return self.load(self._count(await self.cache.aget(self.key(user_id))))
+
+    def set(self, user):
+        self.cache.set(self.key(user.pk), self.entry(user))
+
+    async def aset(self, user):
+        await self.cache.aset(self.key(user.pk), self.entry(user))
+
+    def invalidate(self, user_id):
+        self.cache.delete(self.key(user_id))
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+user_cache = UserCache()
@@ -3,6 +3,13 @@ from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.urls import reverse
+from django.db import connection
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.cache import user_cache
 
 
 User = get_user_model()
@@ -10,6 +17,7 @@ User = get_user_model()
 class UserTest(APITestCase):
 
     def setUp(self):
+        user_cache.cache.clear()
         self.user = User.objects.create_user(username='testuser', password='password', age=20, can_be_contacted=True, can_data_be_shared=True)
         self.inactive_user = User.objects.create_user(username='inactiveuser', password='password', age=20, is_active=False)
         self.user_not_contacted = User.objects.create_user(username='nomailuser', password='password', age=20, can_be_contacted=False, can_data_be_shared=True)
@@ -162,6 +170,63 @@ class UserTest(APITestCase):
         self.assertIn('access', response.data)
         self.assertIn('refresh', response.data)
         
+    def test_user_list_sparse_fieldset(self):
+        url = reverse('user-list') + '?fields=id,username,email'
+        # Authenticated user cached by the first request
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        users = {user['username']: user for user in response.data['results']}
+        self.assertEqual(set(users['testuser']), {'id', 'username', 'email'})
+        self.assertNotIn('email', users['privateuser'])
+        self.assertFalse(any('"authentication_user"."age"' in query['sql'] for query in context.captured_queries))
+
+    def test_authenticated_user_is_cached(self):
+        url = reverse('user-detail', args=[self.user.id])
+        self.client.get(url)
+        user_cache.reset_stats()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(user_cache.stats(), {'hits': 1, 'misses': 0})
+
+    def test_cached_user_holds_no_password_hash(self):
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, 200)
+        entry = user_cache.cache.get(user_cache.key(self.user.id))
+        self.assertIsNotNone(entry)
+        self.assertNotIn(self.user.password, repr(entry))
+        user, password_hash = user_cache.get(self.user.id)
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.id, 'testuser', True))
+
+    # simplejwt remplace son api_settings sur setting_changed, les modules qui l'importent gardent l'ancien
+    @mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_revoked_token_is_rejected_from_cache(self):
+        url = reverse('user-list')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.user).access_token))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Sans signal, l'utilisateur reste en cache avec l'ancien mot de passe
+        User.objects.filter(pk=self.user.pk).update(password=make_password('changed'))
+        self.user.refresh_from_db()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.user).access_token))
+        user_cache.reset_stats()
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(user_cache.stats(), {'hits': 1, 'misses': 0})
+
+    def test_deactivated_user_is_not_served_from_cache(self):
+        url = reverse('user-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_deleted_user_is_not_served_from_cache(self):
+        url = reverse('user-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
     @classmethod
     def tearDownClass(cls):
         super(UserTest, cls).tearDownClass()
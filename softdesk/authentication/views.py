@@ -8,6 +8,7 @@ from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 
 
 from projects.permissions import IsOwner
+from projects.views import ProfilingMixin, SparseFieldsetMixin, QueryPlanMixin
 from authentication.serializers import UserListSerializer, UserDetailSerializer
 
 User = get_user_model()
@@ -23,13 +24,15 @@ class MultipleSerializerMixin:
         return super().get_serializer_class()
 
 
-class UserViewset(MultipleSerializerMixin, ModelViewSet):
+class UserViewset(ProfilingMixin, SparseFieldsetMixin, QueryPlanMixin, MultipleSerializerMixin, ModelViewSet):
 
     serializer_class = UserListSerializer
     detail_serializer_class = UserDetailSerializer
+    # to_representation hides the private fields according to these flags
+    fieldset_base_plan = {'only': ('id', 'can_data_be_shared', 'can_be_contacted')}
     
     def get_queryset(self):
-        return User.objects.filter(is_active=True)
+        return self.apply_query_plan(User.objects.filter(is_active=True))
     
     def get_permissions(self):
         match self.action:
@@ -0,0 +1,223 @@
+"""
+Async read path of the API, served under ASGI (see softdesk/asgi.py).
+
+`async_read_view` wraps the list or detail route of a viewset: GET and HEAD
+run natively on the event loop, the other methods go to the regular sync
+view. The viewset is still the single source of the query plan, sparse
+fieldsets, filters, serializers, conditional GET and response cache; only
+the steps touching the database are replaced with async versions:
+
+- authentication with `aauthenticate()` (CustomJWTAuthentication),
+- permissions with `ahas_permission()` / `ahas_object_permission()`
+  (IsProjectContributor), the sync methods of the other permissions are
+  expected to stay off the database,
+- the page (LimitOffsetPagination) and the object with the async ORM.
+
+Each step is timed in the phase of the matching ProfilingMixin method (see
+projects/profiling.py).
+
+Serialization runs on the loop over rows loaded by the query plan: a field
+missing from the plan raises SynchronousOnlyOperation instead of silently
+querying. Cursor pages and the conditional state still run in the database
+thread through sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+
+from projects import profiling
+from projects.response_cache import project_response_cache
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+async def authenticate(request):
+    """Async Request._authenticate(): set the user and auth of the DRF request."""
+    with profiling.phase(profiling.AUTH):
+        await _authenticate(request)
+
+
+async def _authenticate(request):
+    for authenticator in request.authenticators:
+        if hasattr(authenticator, 'aauthenticate'):
+            user_auth_tuple = await authenticator.aauthenticate(request)
+        else:
+            user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+        if user_auth_tuple is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth_tuple
+            return
+    request._not_authenticated()
+
+
+async def check_permissions(view, request):
+    with profiling.phase(profiling.PERMISSION):
+        for permission in view.get_permissions():
+            if hasattr(permission, 'ahas_permission'):
+                allowed = await permission.ahas_permission(request, view)
+            else:
+                allowed = permission.has_permission(request, view)
+            if not allowed:
+                view.permission_denied(request, message=getattr(permission, 'message', None), code=getattr(permission, 'code', None))
+
+
+async def check_object_permissions(view, request, obj):
+    with profiling.phase(profiling.PERMISSION):
+        for permission in view.get_permissions():
+            if hasattr(permission, 'ahas_object_permission'):
+                allowed = await permission.ahas_object_permission(request, view, obj)
+            else:
+                allowed = permission.has_object_permission(request, view, obj)
+            if not allowed:
+                view.permission_denied(request, message=getattr(permission, 'message', None), code=getattr(permission, 'code', None))
+
+
+async def paginate_queryset(view, queryset):
+    """Async paginate_queryset(), LimitOffsetPagination runs on the async ORM."""
+    with profiling.phase(profiling.QUERYSET):
+        page = await _paginate_queryset(view, queryset)
+    profiling.record_page(page)
+    return page
+
+
+async def _paginate_queryset(view, queryset):
+    paginator = view.paginator
+    if paginator is None:
+        return None
+    if not isinstance(paginator, LimitOffsetPagination):
+        return await sync_to_async(paginator.paginate_queryset)(queryset, view.request, view=view)
+
+    request = view.request
+    paginator.request = request
+    paginator.limit = paginator.get_limit(request)
+    if paginator.limit is None:
+        return None
+    paginator.count = await queryset.acount()
+    paginator.offset = paginator.get_offset(request)
+    if paginator.count > paginator.limit and paginator.template is not None:
+        paginator.display_page_controls = True
+    if paginator.count == 0 or paginator.offset > paginator.count:
+        return []
+    return [obj async for obj in queryset[paginator.offset:paginator.offset + paginator.limit]]
+
+
+async def get_object(view):
+    with profiling.phase(profiling.QUERYSET):
+        queryset = view.filter_queryset(view.get_queryset())
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            raise Http404
+        await check_object_permissions(view, view.request, obj)
+        return obj
+
+
+async def list_handler(view, request):
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await paginate_queryset(view, queryset)
+    if page is not None:
+        return view.get_paginated_response(view.get_serializer(page, many=True).data)
+    objects = [obj async for obj in queryset]
+    return Response(view.get_serializer(objects, many=True).data)
+
+
+async def retrieve_handler(view, request):
+    obj = await get_object(view)
+    return Response(view.get_serializer(obj).data)
+
+
+HANDLERS = {
+    'list': list_handler,
+    'retrieve': retrieve_handler,
+}
+
+
+async def cached_handler(view, request):
+    """The handler of the action, through the project response cache when the view has one."""
+    handler = HANDLERS[view.action]
+    if view.action not in getattr(view, 'response_cache_actions', ()):
+        return await handler(view, request)
+    key = await project_response_cache.akey(view.kwargs[view.response_cache_project_kwarg], request.build_absolute_uri())
+    data = await project_response_cache.aget(key)
+    if data is not None:
+        return Response(data)
+    response = await handler(view, request)
+    if response.status_code == 200:
+        await project_response_cache.aset(key, response.data)
+    return response
+
+
+async def conditional_handler(view, request):
+    """The cached handler, answered with a 304 when the view conditional state did not change."""
+    state = None
+    if hasattr(view, 'aget_conditional_state'):
+        try:
+            state = await view.aget_conditional_state()
+        except (DjangoValidationError, ValueError):
+            state = None
+    if state is None:
+        return await cached_handler(view, request)
+
+    etag, timestamp = view.get_validators(request, state)
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = await cached_handler(view, request)
+    return view.set_validators(response, etag, timestamp)
+
+
+def rendered(response):
+    """
+    Render a DRF Response on the loop and return it as a plain HttpResponse,
+    which Django does not render again in a thread.
+    """
+    if hasattr(response, 'render'):
+        response.render()
+        plain = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            plain[header] = value
+        return plain
+    return response
+
+
+def async_read_view(viewset_class, action, sync_view):
+    """
+    View of a router route serving GET and HEAD with `action` of
+    `viewset_class` on the event loop, and the other methods with the
+    router `sync_view`.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        viewset = viewset_class(action_map={method.lower(): action for method in READ_METHODS})
+        viewset.action = action
+        viewset.args = args
+        viewset.kwargs = kwargs
+        viewset.headers = viewset.default_response_headers
+        request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = request
+
+        try:
+            viewset.format_kwarg = viewset.get_format_suffix(**kwargs)
+            request.accepted_renderer, request.accepted_media_type = viewset.perform_content_negotiation(request)
+            request.version, request.versioning_scheme = viewset.determine_version(request, *args, **kwargs)
+            await authenticate(request)
+            await check_permissions(viewset, request)
+            viewset.check_throttles(request)
+            if hasattr(viewset, 'check_requested_fields'):
+                viewset.check_requested_fields()
+            profiling.switch(profiling.SERIALIZE)
+            response = await conditional_handler(viewset, request)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        return rendered(viewset.finalize_response(request, response, *args, **kwargs))
+
+    view.csrf_exempt = True
+    view.cls = viewset_class
+    view.actions = sync_view.actions
+    return view
@@ -0,0 +1,306 @@
+"""
+Query-budget benchmark over scaled fixtures.
+
+`seed` bulk-creates a dataset of a given size, `measure_routes` calls every
+route registered on the API router, and the extra actions of its viewsets,
+against it and records the query count, DB time and wall time, and
+`check_budgets` compares the query counts with the budgets checked in
+`query_budgets.json`. `find_full_scans` runs EXPLAIN QUERY PLAN on the
+queries of every route.
+"""
+import json
+import math
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from projects import changelog, export
+from projects.models import Project, Contributor, Issue, Comment
+from projects.response_cache import project_response_cache
+
+User = get_user_model()
+
+BUDGETS_FILE = Path(__file__).resolve().parent / 'query_budgets.json'
+DEFAULT_SIZES = (10, 1000, 100000)
+BATCH_SIZE = 1000
+
+# Routes listing a whole table, where a scan of that table is expected
+ALLOWED_FULL_SCANS = {
+    ('user-list', 'authentication_user'),
+    ('contributor-list', 'projects_contributor'),
+    ('project-list', 'projects_project'),
+}
+# Query strings checked in addition to the plain list routes
+EXTRA_LIST_QUERIES = {
+    'issue-list': [
+        'pagination=cursor',
+        'status=to-do&ordering=-updated_time',
+        'priority=medium&ordering=updated_time',
+        'tag=task&pagination=cursor',
+        'ordering=-created_time',
+        'updated_time_after=2000-01-01T00:00:00Z',
+    ],
+    'comment-list': ['pagination=cursor', 'created_time_after=2000-01-01T00:00:00Z&ordering=-created_time'],
+}
+
+# `name` keys the results and the budgets, `body` builds the request data from the dataset
+Route = namedtuple('Route', ['name', 'url_name', 'basename', 'detail', 'method', 'query', 'body'])
+
+# The @action routes, not listed by the router registry. The writes come
+# last so that every read is measured on the seeded rows.
+ACTION_ROUTES = [
+    Route('project-export', 'project-export', 'project', True, 'get', '', None),
+    Route('project-search', 'project-search', 'project', True, 'get', 'q=benchmark', None),
+    Route('project-events', 'project-events', 'project', True, 'get', '', None),
+    Route('issue-bulk-patch', 'issue-bulk', 'issue', False, 'patch', '',
+          lambda dataset: [{'id': dataset.issue.pk, 'status': 'in-progress', 'assignees': [dataset.contributor.user_id]}]),
+    Route('issue-bulk-post', 'issue-bulk', 'issue', False, 'post', '',
+          lambda dataset: [
+              {'title': f'Bulk {index}', 'description': 'Benchmark issue', 'status': 'to-do', 'priority': 'low',
+               'tag': 'bug', 'assignees': [dataset.contributor.user_id]}
+              for index in range(2)
+          ]),
+]
+# Routes reading their rows chunk by chunk: the budget holds for one chunk,
+# every further chunk adds its own prefetch queries (the assignees and comments)
+CHUNKED_ROUTES = {
+    'project-export': (export.CHUNK_SIZE, 2),
+}
+
+
+class Dataset:
+    """Handles on the seeded rows needed to build the route URLs."""
+
+    def __init__(self, size, owner, project, issue, comment, contributor):
+        self.size = size
+        self.owner = owner
+        self.project = project
+        self.issue = issue
+        self.comment = comment
+        self.contributor = contributor
+
+    def route_kwargs(self, basename, detail):
+        """Return the URL kwargs for the list or detail route of `basename`."""
+        kwargs = {}
+        if basename in ('issue', 'comment'):
+            kwargs['project_pk'] = self.project.pk
+        if basename == 'comment':
+            kwargs['issue_pk'] = self.issue.pk
+        if detail:
+            detail_pks = {
+                'user': self.owner.pk,
+                'contributor': self.contributor.pk,
+                'project': self.project.pk,
+                'issue': self.issue.pk,
+                'comment': self.comment.pk,
+            }
+            if basename not in detail_pks:
+                raise KeyError(f"No benchmark fixture for the '{basename}' route, add one to Dataset.route_kwargs")
+            kwargs['pk'] = detail_pks[basename]
+        return kwargs
+
+
+def seed(size, prefix='bench'):
+    """
+    Bulk-create `size` users, `size` projects, `size` contributors on the
+    benchmarked project, `size` issues (two assignees each) and `size`
+    comments on its first issue, with their change log.
+    """
+    # bulk_create bypasses the signals that invalidate the cached memberships and responses
+    cache.clear()
+    project_response_cache.clear()
+    owner = User.objects.create(username=f'{prefix}-owner', password='!')
+    users = User.objects.bulk_create(
+        [User(username=f'{prefix}-user-{index}', password='!') for index in range(size)],
+        batch_size=BATCH_SIZE,
+    )
+
+    # bulk_create skips the post_save signal, so the author memberships are added here
+    projects = Project.objects.bulk_create(
+        [Project(name=f'{prefix} project {index}', description='Benchmark project', type='back-end', author=owner)
+         for index in range(size)],
+        batch_size=BATCH_SIZE,
+    )
+    owner_contributors = Contributor.objects.bulk_create(
+        [Contributor(user=owner, project=project) for project in projects],
+        batch_size=BATCH_SIZE,
+    )
+    project = projects[0]
+    contributors = Contributor.objects.bulk_create(
+        [Contributor(user=user, project=project) for user in users],
+        batch_size=BATCH_SIZE,
+    )
+    owner_contributor = Contributor.objects.get(user=owner, project=project)
+
+    issues = Issue.objects.bulk_create(
+        [Issue(project=project, author=owner_contributor, title=f'Issue {index}', description='Benchmark issue',
+               status='to-do', priority='medium', tag='task') for index in range(size)],
+        batch_size=BATCH_SIZE,
+    )
+    Assignment = Issue.assignees.through
+    Assignment.objects.bulk_create(
+        [Assignment(issue_id=issue.pk, contributor_id=contributors[(index + offset) % size].pk)
+         for index, issue in enumerate(issues) for offset in (0, 1) if size > offset],
+        batch_size=BATCH_SIZE,
+    )
+
+    comments = Comment.objects.bulk_create(
+        [Comment(issue=issues[0], author=contributors[index], description=f'Comment {index}')
+         for index in range(size)],
+        batch_size=BATCH_SIZE,
+    )
+    Issue.objects.filter(pk=issues[0].pk).update(comments_count=size)
+
+    # The change log read by the sync route
+    changelog.record_objects(projects + owner_contributors + contributors + issues, changelog.CREATED)
+    changelog.record([changelog.entry(comment, changelog.CREATED, project.pk) for comment in comments])
+    return Dataset(size, owner, project, issues[0], comments[0], contributors[0])
+
+
+def get_routes():
+    """Return a Route for every route registered on the API router, then for ACTION_ROUTES."""
+    from softdesk.urls import router
+
+    routes = []
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            routes.append(Route(f'{basename}-list', f'{basename}-list', basename, False, 'get', '', None))
+        if hasattr(viewset, 'retrieve'):
+            routes.append(Route(f'{basename}-detail', f'{basename}-detail', basename, True, 'get', '', None))
+    return routes + ACTION_ROUTES
+
+
+def route_request(route, dataset, query=None):
+    """Return the (method, url, data) of a request on `route` for the dataset."""
+    url = reverse(route.url_name, kwargs=dataset.route_kwargs(route.basename, route.detail))
+    query = route.query if query is None else query
+    return route.method, f'{url}?{query}' if query else url, route.body(dataset) if route.body else None
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their cumulated duration."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+def send(client, method, url, data=None):
+    """Send the request and read a streamed body, whose queries run while it is consumed."""
+    response = getattr(client, method)(url, data, format='json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, url, method='get', data=None):
+    timer = QueryTimer()
+    with connection.execute_wrapper(timer):
+        start = time.perf_counter()
+        response = send(client, method, url, data)
+        wall_time = time.perf_counter() - start
+    return {
+        'status': response.status_code,
+        'queries': timer.queries,
+        'db_time_ms': round(timer.duration * 1000, 3),
+        'wall_time_ms': round(wall_time * 1000, 3),
+    }
+
+
+def owner_client(dataset):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(dataset.owner).access_token))
+    return client
+
+
+def measure_routes(dataset):
+    """Call every route as the dataset owner and return the measures keyed by route name."""
+    client = owner_client(dataset)
+    results = {}
+    # The event stream ends once the replay is sent instead of waiting for events
+    with override_settings(EVENTS_STREAM_SECONDS=0):
+        for route in get_routes():
+            method, url, data = route_request(route, dataset)
+            results[route.name] = measure(client, url, method, data)
+            if route.name in CHUNKED_ROUTES:
+                results[route.name]['chunks'] = max(math.ceil(dataset.size / CHUNKED_ROUTES[route.name][0]), 1)
+    return results
+
+
+def load_budgets(path=BUDGETS_FILE):
+    with open(path) as budgets_file:
+        return json.load(budgets_file)
+
+
+def check_budgets(results, budgets):
+    """Return a list of human readable budget violations (empty when everything fits)."""
+    violations = []
+    for name, result in results.items():
+        if not 200 <= result['status'] < 300:
+            violations.append(f'{name}: unexpected status {result["status"]}')
+        if name not in budgets:
+            violations.append(f'{name}: no query budget in {BUDGETS_FILE.name}')
+            continue
+        budget = budgets[name]
+        if name in CHUNKED_ROUTES:
+            budget += (result['chunks'] - 1) * CHUNKED_ROUTES[name][1]
+        if result['queries'] > budget:
+            violations.append(f'{name}: {result["queries"]} queries, budget is {budget}')
+    return violations
+
+
+def explain(sql):
+    """Return the EXPLAIN QUERY PLAN details of an already interpolated SQLite query."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlansUnavailable(Exception):
+    """The database backend is not SQLite, whose EXPLAIN QUERY PLAN output is parsed."""
+
+
+def find_full_scans(dataset):
+    """
+    Call every route and return the full table scans found in the
+    query plans of its SELECT statements, as (route, table, sql) tuples.
+    """
+    if connection.vendor != 'sqlite':
+        raise QueryPlansUnavailable('Query plans are only checked on SQLite')
+
+    client = owner_client(dataset)
+    scans = []
+    with override_settings(EVENTS_STREAM_SECONDS=0):
+        for route in get_routes():
+            name = route.name
+            for query_string in [route.query] + EXTRA_LIST_QUERIES.get(name, []):
+                method, url, data = route_request(route, dataset, query_string)
+                with CaptureQueriesContext(connection) as context:
+                    send(client, method, url, data)
+                for query in context.captured_queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    for detail_line in explain(query['sql']):
+                        # "SCAN table" without "USING ... INDEX" reads every row of the table,
+                        # a "VIRTUAL TABLE" scan is the FTS5 index answering the MATCH
+                        words = detail_line.split()
+                        if (words[0] == 'SCAN' and 'USING' not in words and 'VIRTUAL' not in words
+                                and (name, words[1]) not in ALLOWED_FULL_SCANS):
+                            scans.append((name, words[1], query['sql']))
+    return scans
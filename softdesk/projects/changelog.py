@@ -0,0 +1,132 @@
+"""
+Sequence-numbered change log of the projects and delta sync.
+
+Every write to a Project, Contributor, Issue or Comment appends a ChangeLog
+entry in the transaction of the write: the signals log single rows (the
+viewsets run their writes in a transaction), the bulk paths, which send no
+signals, log their rows with `record` / `record_issues`.
+
+`changes_since` reads the log of the projects of a user after a sequence
+number, for clients keeping an offline copy of their projects. Entries are
+read in `seq` order, which is also the commit order as long as the writes
+are serialized (SQLite); with concurrent writers a reader could see an entry
+before an earlier one commits.
+"""
+from projects.models import ChangeLog, Contributor, Issue, Comment, Project
+
+PROJECT = 'project'
+CONTRIBUTOR = 'contributor'
+ISSUE = 'issue'
+COMMENT = 'comment'
+MODELS = (PROJECT, CONTRIBUTOR, ISSUE, COMMENT)
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+BATCH_SIZE = 1000
+
+
+def entry(obj, action, project_id=None):
+    """
+    The (unsaved) ChangeLog entry of a write to a Project, Contributor,
+    Issue or Comment. Comments need the `project_id` of their issue.
+    """
+    if isinstance(obj, Project):
+        return ChangeLog(model=PROJECT, action=action, project_id=obj.pk, object_id=str(obj.pk))
+    elif isinstance(obj, Contributor):
+        return ChangeLog(model=CONTRIBUTOR, action=action, project_id=obj.project_id, object_id=str(obj.pk), user_id=obj.user_id)
+    elif isinstance(obj, Issue):
+        return ChangeLog(model=ISSUE, action=action, project_id=obj.project_id, object_id=str(obj.pk))
+    elif isinstance(obj, Comment):
+        return ChangeLog(model=COMMENT, action=action, project_id=project_id, object_id=str(obj.pk))
+    raise TypeError(f'No change log for {type(obj).__name__}')
+
+
+def issue_entry(issue_id, project_id, action=UPDATED):
+    """The entry of an issue written by id, with a queryset update."""
+    return ChangeLog(model=ISSUE, action=action, project_id=project_id, object_id=str(issue_id))
+
+
+def record(entries):
+    ChangeLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+def record_objects(objects, action):
+    """Log the bulk writes of projects, contributors or issues."""
+    record([entry(obj, action) for obj in objects])
+
+
+def record_issues(issue_ids, action=UPDATED):
+    """Log the issues written with queryset updates, from their ids."""
+    if issue_ids:
+        record([
+            issue_entry(issue_id, project_id, action)
+            for issue_id, project_id in Issue.objects.filter(pk__in=issue_ids).values_list('id', 'project_id')
+        ])
+
+
+def _object_id(model, object_id):
+    return object_id if model == COMMENT else int(object_id)
+
+
+def changes_since(user, since, limit):
+    """
+    Return what changed in the projects of `user` after the entry `since`,
+    reading at most `limit` entries:
+
+    - `next`: the seq to pass as `since` for the following changes, and
+      `more` when there are some already,
+    - `changed`: the ids of the created or updated rows, per model,
+    - `deleted`: the ids of the deleted rows, per model, including the
+      projects the user was removed from (or that were deleted),
+    - `reload`: the projects the user joined, whose rows from before the
+      join are not in the log window and must be downloaded in full.
+    """
+    project_ids = Contributor.objects.filter(user=user).values('project_id')
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=since, project_id__in=project_ids)
+        .order_by('seq')
+        .only('seq', 'project_id', 'model', 'object_id', 'action', 'user_id')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    next_seq = entries[-1].seq if entries else since
+
+    # Last action per row, in the order of the last change
+    actions = {}
+    for change in entries:
+        key = (change.model, change.object_id)
+        actions.pop(key, None)
+        actions[key] = change.action
+    changed = {model: [] for model in MODELS}
+    deleted = {model: [] for model in MODELS}
+    for (model, object_id), action in actions.items():
+        (deleted if action == DELETED else changed)[model].append(_object_id(model, object_id))
+
+    created_projects = {change.project_id for change in entries if change.model == PROJECT and change.action == CREATED}
+    joined = {
+        change.project_id for change in entries
+        if change.model == CONTRIBUTOR and change.user_id == user.pk and change.action == CREATED
+    }
+    reload = sorted(joined - created_projects)
+
+    # The entries of the projects the user left are out of the scope above
+    left_projects = (
+        ChangeLog.objects
+        .filter(model=CONTRIBUTOR, user_id=user.pk, action=DELETED, seq__gt=since)
+        .exclude(project_id__in=project_ids)
+    )
+    if more:
+        left_projects = left_projects.filter(seq__lte=next_seq)
+    for project_id in sorted(set(left_projects.values_list('project_id', flat=True))):
+        if project_id not in deleted[PROJECT]:
+            deleted[PROJECT].append(project_id)
+
+    return {
+        'next': next_seq,
+        'more': more,
+        'changed': changed,
+        'deleted': deleted,
+        'reload': reload,
+    }
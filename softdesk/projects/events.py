@@ -0,0 +1,295 @@
+"""
+Server-sent events of the projects, streamed by `/api/projects/{pk}/events/`.
+
+The Project, Issue and Comment signals publish their events to the
+in-process `broker` once the transaction commits. The broker keeps the last
+EVENTS_HISTORY_SIZE events of every project, replayed to the clients
+reconnecting with `Last-Event-ID`, and fans every event out to the
+subscribers of the project.
+
+Every subscriber buffers at most EVENTS_CLIENT_BUFFER_SIZE events: a client
+too slow to drain its buffer gets an `overflow` event and is disconnected,
+it resumes from the history when it reconnects. A client whose
+`Last-Event-ID` is older than the history (or comes from another process)
+gets a `reset` event and must reload the project.
+
+Events are process-local: with several worker processes, a stream only
+carries the writes handled by the process serving it.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from projects.membership import load_contributor_id, aload_contributor_id
+
+Event = namedtuple('Event', ['seq', 'type', 'data'])
+
+RESET = 'reset'
+OVERFLOW = 'overflow'
+KEEPALIVE = ': keepalive\n\n'
+# Without an id, so that the client resumes after the last event it received
+OVERFLOW_EVENT = f'event: {OVERFLOW}\ndata: {{}}\n\n'
+
+
+class Subscription:
+    """Bounded buffer of the events of a project for one stream."""
+
+    def __init__(self, project_id, buffer_size, loop=None):
+        self.project_id = project_id
+        self.buffer_size = buffer_size
+        self.events = deque()
+        self.overflowed = False
+        self.closed = False
+        self._condition = threading.Condition()
+        # Async streams are woken on their event loop
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else None
+
+    def push(self, event):
+        with self._condition:
+            if len(self.events) < self.buffer_size:
+                self.events.append(event)
+            else:
+                self.overflowed = True
+            self._condition.notify()
+        self._wake()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # Loop closed, the stream is gone
+                pass
+
+    def _drain(self):
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def wait(self, timeout):
+        """Return the buffered events, waiting at most `timeout` seconds for one."""
+        with self._condition:
+            if not self.events and not self.overflowed and not self.closed:
+                self._condition.wait(timeout)
+            return self._drain()
+
+    async def await_events(self, timeout):
+        """wait() for the async streams."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        with self._condition:
+            return self._drain()
+
+
+class EventBroker:
+    """
+    In-process fan-out of the project events. Event ids are
+    `<epoch>-<seq>`: `seq` increases over all the projects of the process
+    and the epoch tells apart the ids sent before a restart.
+    """
+
+    def __init__(self):
+        self.epoch = format(time.time_ns(), 'x')
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history = {}
+        # Last seq dropped from the history of each project
+        self._evicted = {}
+        self._subscribers = {}
+
+    def event_id(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def parse_event_id(self, event_id):
+        """The seq of an id sent by this process, None otherwise."""
+        epoch, _, seq = (event_id or '').strip().partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, project_id, type, data):
+        # Ids set from the URL kwargs are strings
+        project_id = int(project_id)
+        data = json.dumps(data, cls=DjangoJSONEncoder)
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, type, data)
+            history = self._history.get(project_id)
+            if history is None:
+                history = self._history[project_id] = deque(maxlen=settings.EVENTS_HISTORY_SIZE)
+            if len(history) == history.maxlen:
+                self._evicted[project_id] = history[0].seq
+            history.append(event)
+            # Pushed under the lock so that every subscriber gets the events in order
+            for subscription in self._subscribers.get(project_id, ()):
+                subscription.push(event)
+        return event
+
+    def publish_on_commit(self, project_id, type, data):
+        """Publish the event once the current transaction commits, never if it rolls back."""
+        if project_id is not None:
+            transaction.on_commit(lambda: self.publish(project_id, type, data))
+
+    def subscribe(self, project_id, last_event_id=None, loop=None):
+        """
+        Register a new subscriber of the project. Return it with the events
+        to send first: those published after `last_event_id` when given, or
+        a single `reset` event when they are no longer all in the history.
+        """
+        project_id = int(project_id)
+        subscription = Subscription(project_id, settings.EVENTS_CLIENT_BUFFER_SIZE, loop)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+            if last_event_id is None:
+                return subscription, []
+            seq = self.parse_event_id(last_event_id)
+            if seq is None or seq < self._evicted.get(project_id, 0):
+                return subscription, [Event(self._seq, RESET, '{}')]
+            return subscription, [event for event in self._history.get(project_id, ()) if event.seq > seq]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.project_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.project_id]
+
+    def close_project(self, project_id):
+        """End the streams and drop the history of a deleted project."""
+        project_id = int(project_id)
+        with self._lock:
+            self._history.pop(project_id, None)
+            self._evicted.pop(project_id, None)
+            for subscription in self._subscribers.pop(project_id, ()):
+                subscription.close()
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+            self._evicted.clear()
+            for subscriptions in self._subscribers.values():
+                for subscription in subscriptions:
+                    subscription.close()
+            self._subscribers.clear()
+
+
+broker = EventBroker()
+
+
+def issue_data(issue):
+    return {
+        'id': issue.pk,
+        'project': int(issue.project_id),
+        'title': issue.title,
+        'status': issue.status,
+        'priority': issue.priority,
+        'tag': issue.tag,
+        'updated_time': issue.updated_time,
+    }
+
+
+def comment_data(comment, project_id):
+    return {
+        'id': str(comment.pk),
+        'issue': comment.issue_id,
+        'project': project_id,
+        'created_time': comment.created_time,
+    }
+
+
+def publish_issues(issues, type):
+    """Publish an event per issue for the bulk writes, which send no signals."""
+    for issue in issues:
+        broker.publish_on_commit(issue.project_id, type, issue_data(issue))
+
+
+def publish_resets(project_ids):
+    """Tell the clients of the projects to reload them, after writes too large for an event per row."""
+    for project_id in project_ids:
+        broker.publish_on_commit(project_id, RESET, {})
+
+
+def format_event(event):
+    return f'id: {broker.event_id(event.seq)}\nevent: {event.type}\ndata: {event.data}\n\n'
+
+
+def _retry():
+    return f'retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n'
+
+
+def stream(project_id, user_id, last_event_id=None):
+    """
+    Event stream of the project for the WSGI path, blocking a worker while
+    it runs. Ends after EVENTS_STREAM_SECONDS (clients reconnect with their
+    Last-Event-ID), on overflow, once the project is deleted, or when the
+    user is no longer a contributor (checked at every keepalive).
+    """
+    subscription, replay = broker.subscribe(project_id, last_event_id)
+    try:
+        deadline = time.monotonic() + settings.EVENTS_STREAM_SECONDS
+        yield _retry()
+        for event in replay:
+            yield format_event(event)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = subscription.wait(min(settings.EVENTS_KEEPALIVE_SECONDS, remaining))
+            for event in events:
+                yield format_event(event)
+            if subscription.overflowed:
+                yield OVERFLOW_EVENT
+                break
+            if subscription.closed:
+                break
+            if not events:
+                if load_contributor_id(user_id, project_id) is None:
+                    break
+                yield KEEPALIVE
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def astream(project_id, user_id, last_event_id=None):
+    """stream() for the ASGI path, waiting on the event loop."""
+    subscription, replay = broker.subscribe(project_id, last_event_id, loop=asyncio.get_running_loop())
+    try:
+        deadline = time.monotonic() + settings.EVENTS_STREAM_SECONDS
+        yield _retry()
+        for event in replay:
+            yield format_event(event)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = await subscription.await_events(min(settings.EVENTS_KEEPALIVE_SECONDS, remaining))
+            for event in events:
+                yield format_event(event)
+            if subscription.overflowed:
+                yield OVERFLOW_EVENT
+                break
+            if subscription.closed:
+                break
+            if not events:
+                if await aload_contributor_id(user_id, project_id) is None:
+                    break
+                yield KEEPALIVE
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,124 @@
+"""
+Streaming export of the issues of a project with their assignees and
+comments. Issues are read with QuerySet.iterator(chunk_size=...) so that
+only one chunk, with its prefetched assignees and comments, is in memory.
+
+Under ASGI a sync iterator handed to StreamingHttpResponse is consumed whole
+before anything is sent, so the views stream the `a*` async generators
+there, reading the chunks with QuerySet.aiterator().
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from projects.models import Contributor, Issue, Comment
+
+CHUNK_SIZE = 500
+CSV_COLUMNS = [
+    'record_type', 'issue_id', 'comment_id', 'title', 'description', 'status', 'priority', 'tag',
+    'author', 'assignees', 'comments_count', 'created_time', 'updated_time',
+]
+
+
+def export_queryset(project_id):
+    return (
+        Issue.objects
+        .filter(project_id=project_id)
+        .order_by('id')
+        .select_related('author__user')
+        .prefetch_related(
+            Prefetch('assignees', queryset=Contributor.objects.select_related('user').only('id', 'user__id', 'user__username')),
+            Prefetch('comments', queryset=Comment.objects.select_related('author__user').order_by('created_time', 'id')),
+        )
+    )
+
+
+def iter_issues(project_id, chunk_size=CHUNK_SIZE):
+    return export_queryset(project_id).iterator(chunk_size=chunk_size)
+
+
+def aiter_issues(project_id, chunk_size=CHUNK_SIZE):
+    return export_queryset(project_id).aiterator(chunk_size=chunk_size)
+
+
+def issue_record(issue):
+    return {
+        'id': issue.id,
+        'title': issue.title,
+        'description': issue.description,
+        'status': issue.status,
+        'priority': issue.priority,
+        'tag': issue.tag,
+        'author': issue.author.user.username,
+        'assignees': [contributor.user.username for contributor in issue.assignees.all()],
+        'comments_count': issue.comments_count,
+        'created_time': issue.created_time,
+        'updated_time': issue.updated_time,
+        'comments': [
+            {
+                'id': comment.id,
+                'author': comment.author.user.username,
+                'description': comment.description,
+                'created_time': comment.created_time,
+            }
+            for comment in issue.comments.all()
+        ],
+    }
+
+
+def ndjson_line(issue):
+    return json.dumps(issue_record(issue), cls=DjangoJSONEncoder) + '\n'
+
+
+def ndjson_lines(project_id, chunk_size=CHUNK_SIZE):
+    """One JSON object per issue, comments nested."""
+    for issue in iter_issues(project_id, chunk_size):
+        yield ndjson_line(issue)
+
+
+async def andjson_lines(project_id, chunk_size=CHUNK_SIZE):
+    """ndjson_lines() for the ASGI path."""
+    async for issue in aiter_issues(project_id, chunk_size):
+        yield ndjson_line(issue)
+
+
+class Echo:
+    """File-like object handing back what the csv writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(issue):
+    """The row of the issue followed by one row per comment of the issue."""
+    record = issue_record(issue)
+    yield [
+        'issue', record['id'], '', record['title'], record['description'], record['status'],
+        record['priority'], record['tag'], record['author'], ';'.join(record['assignees']),
+        record['comments_count'], record['created_time'].isoformat(), record['updated_time'].isoformat(),
+    ]
+    for comment in record['comments']:
+        yield [
+            'comment', record['id'], comment['id'], '', comment['description'], '', '', '',
+            comment['author'], '', '', comment['created_time'].isoformat(), '',
+        ]
+
+
+def csv_lines(project_id, chunk_size=CHUNK_SIZE):
+    """One row per issue followed by one row per comment of the issue."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for issue in iter_issues(project_id, chunk_size):
+        for row in csv_rows(issue):
+            yield writer.writerow(row)
+
+
+async def acsv_lines(project_id, chunk_size=CHUNK_SIZE):
+    """csv_lines() for the ASGI path."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    async for issue in aiter_issues(project_id, chunk_size):
+        for row in csv_rows(issue):
+            yield writer.writerow(row)
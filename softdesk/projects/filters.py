@@ -0,0 +1,45 @@
+from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
+
+from projects.models import Issue, Comment, STATUS_CHOICES, PRIORITY_CHOICES, TAG_CHOICES
+
+
+class IssueFilter(filters.FilterSet):
+    """
+    Filters of the issues of a project. `assignee` and `author` are user ids,
+    `updated_time_after` / `updated_time_before` ISO 8601 datetimes, and
+    status, priority and tag accept several values. Each of these three has
+    a (project, field, updated_time) index.
+    """
+    status = filters.MultipleChoiceFilter(choices=STATUS_CHOICES, distinct=False)
+    priority = filters.MultipleChoiceFilter(choices=PRIORITY_CHOICES, distinct=False)
+    tag = filters.MultipleChoiceFilter(choices=TAG_CHOICES, distinct=False)
+    assignee = filters.NumberFilter(field_name='assignees__user')
+    author = filters.NumberFilter(field_name='author__user')
+    updated_time = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Issue
+        fields = ['status', 'priority', 'tag', 'assignee', 'author', 'updated_time']
+
+
+class CommentFilter(filters.FilterSet):
+    author = filters.NumberFilter(field_name='author__user')
+    created_time = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Comment
+        fields = ['author', 'created_time']
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter restricted to the view `ordering_fields`, completed with
+    the id in the same direction so that pages (and cursors) are stable.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering = list(ordering) + ['-id' if ordering[-1].startswith('-') else 'id']
+        return ordering
@@ -0,0 +1,333 @@
+"""
+Streaming NDJSON importer for whole trackers.
+
+Every line is a JSON object whose `model` is one of project, contributor,
+issue or comment. Source ids are kept as primary keys and users are
+referenced by username:
+
+    {"model": "project", "id": 1, "name": "...", "description": "...", "type": "back-end", "author": "alice"}
+    {"model": "contributor", "project": 1, "user": "bob"}
+    {"model": "issue", "id": 10, "project": 1, "author": "alice", "title": "...", "description": "...",
+     "status": "to-do", "priority": "low", "tag": "bug", "assignees": ["bob"]}
+    {"model": "comment", "id": "<uuid>", "issue": 10, "author": "bob", "description": "..."}
+
+`created_time` and `updated_time` are optional ISO 8601 datetimes. Project
+and issue ids are integers, comment ids UUIDs (generated when missing). A
+record may only reference rows from earlier lines or already in the
+database, and `type`, `status`, `priority` and `tag` must be values of the
+model choices.
+
+Rows are buffered and inserted with bulk_create, one transaction per batch,
+so memory stays constant whatever the file size. An invalid batch is rolled
+back and stops the import, the previous batches stay imported. bulk_create sends no
+signals: their effects (author as contributor, issue updated_time and
+comments_count, project response cache versions, search index, change log,
+a reset event per project) are applied afterwards as set operations on each
+batch.
+"""
+import json
+import time
+import uuid
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from projects.membership import invalidate_memberships
+from projects.models import (
+    Project, Contributor, Issue, Comment, TYPE_CHOICES, STATUS_CHOICES, PRIORITY_CHOICES, TAG_CHOICES,
+)
+from projects.response_cache import project_response_cache
+from projects.events import publish_resets
+from projects import changelog, search
+
+User = get_user_model()
+
+MODELS = ('project', 'contributor', 'issue', 'comment')
+
+
+class ImportFailed(Exception):
+    pass
+
+
+def parse_time(value, line_number):
+    if value is None:
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ImportFailed(f'line {line_number}: invalid datetime {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+class TrackerImporter:
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.buffers = {model: [] for model in MODELS}
+        self.counts = Counter()
+        self.touched_projects = set()
+        self.batches = 0
+
+    def import_lines(self, lines):
+        """Import an iterable of NDJSON lines and return the number of rows inserted per model."""
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise ImportFailed(f'line {line_number}: {error}')
+            model = record.get('model') if isinstance(record, dict) else None
+            if not isinstance(model, str) or model not in self.buffers:
+                raise ImportFailed(f'line {line_number}: unknown model {model!r}')
+            self.buffers[model].append((line_number, record))
+            if sum(len(buffer) for buffer in self.buffers.values()) >= self.batch_size:
+                self.flush()
+        self.flush()
+        return self.counts
+
+    def flush(self):
+        if not any(self.buffers.values()):
+            return
+        self.batches += 1
+        line_numbers = [line_number for buffer in self.buffers.values() for line_number, record in buffer]
+        try:
+            with transaction.atomic():
+                users = self.resolve_users()
+                self.insert_projects(users)
+                self.insert_contributors(users)
+                self.insert_issues(users)
+                self.insert_comments(users)
+                project_response_cache.bump(self.touched_projects)
+                publish_resets(self.touched_projects)
+        except IntegrityError as error:
+            # Duplicate ids (e.g. a file imported twice) or rows referenced but missing
+            raise ImportFailed(
+                f'batch {self.batches} (lines {min(line_numbers)}-{max(line_numbers)}) rolled back: {error}'
+            )
+        self.touched_projects = set()
+        self.buffers = {model: [] for model in MODELS}
+
+    def resolve_users(self):
+        usernames = set()
+        for line_number, record in self.buffers['project'] + self.buffers['issue'] + self.buffers['comment']:
+            usernames.add(record.get('author'))
+        for line_number, record in self.buffers['contributor']:
+            usernames.add(record.get('user'))
+        for line_number, record in self.buffers['issue']:
+            usernames.update(self.assignees(record, line_number))
+        usernames = [username for username in usernames if isinstance(username, str)]
+        return dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    def user_id(self, users, username, line_number):
+        if not isinstance(username, str) or username not in users:
+            raise ImportFailed(f'line {line_number}: unknown user {username!r}')
+        return users[username]
+
+    def assignees(self, record, line_number):
+        assignees = record.get('assignees', [])
+        if not isinstance(assignees, list) or not all(isinstance(username, str) for username in assignees):
+            raise ImportFailed(f'line {line_number}: invalid assignees {assignees!r}')
+        return assignees
+
+    def field(self, record, name, line_number):
+        if name not in record:
+            raise ImportFailed(f'line {line_number}: missing {name!r}')
+        return record[name]
+
+    def integer(self, record, name, line_number):
+        value = self.field(record, name, line_number)
+        # bool is an int subclass, but not an id
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ImportFailed(f'line {line_number}: invalid {name} {value!r}, an integer id is expected')
+        return value
+
+    def comment_id(self, record, line_number):
+        value = record.get('id')
+        if value is None:
+            return uuid.uuid4()
+        try:
+            return uuid.UUID(value)
+        except (TypeError, ValueError, AttributeError):
+            raise ImportFailed(f'line {line_number}: invalid id {value!r}, a UUID is expected')
+
+    def choice(self, record, name, choices, line_number):
+        value = self.field(record, name, line_number)
+        if value not in {choice for choice, label in choices}:
+            raise ImportFailed(f'line {line_number}: invalid {name} {value!r}')
+        return value
+
+    def check_projects(self, records):
+        """Check that the projects referenced by the records exist, in the database or earlier in the batch."""
+        project_ids = {self.integer(record, 'project', line_number) for line_number, record in records}
+        existing = set(Project.objects.filter(pk__in=project_ids).values_list('id', flat=True))
+        for line_number, record in records:
+            if record['project'] not in existing:
+                raise ImportFailed(f'line {line_number}: unknown project {record["project"]!r}')
+
+    def ensure_contributors(self, pairs):
+        """Add the missing (project_id, user_id) memberships and return the Contributor ids of all the pairs."""
+        if not pairs:
+            return {}
+        project_ids = {project_id for project_id, user_id in pairs}
+        # The records add issues or comments to these projects
+        self.touched_projects |= project_ids
+        user_ids = {user_id for project_id, user_id in pairs}
+
+        def load():
+            rows = Contributor.objects.filter(project_id__in=project_ids, user_id__in=user_ids).values_list('project_id', 'user_id', 'id')
+            return {(project_id, user_id): contributor_id for project_id, user_id, contributor_id in rows}
+
+        contributors = load()
+        missing = pairs - contributors.keys()
+        if not missing:
+            return contributors
+        Contributor.objects.bulk_create([Contributor(project_id=project_id, user_id=user_id) for project_id, user_id in missing])
+        contributors = load()
+        # Only the new memberships are logged, an existing one would make the sync reload its project
+        changelog.record_objects(
+            [Contributor(id=contributors[pair], project_id=pair[0], user_id=pair[1]) for pair in missing],
+            changelog.CREATED,
+        )
+        for project_id in {project_id for project_id, user_id in missing}:
+            invalidate_memberships(project_id, [user_id for pair_project_id, user_id in missing if pair_project_id == project_id])
+        return contributors
+
+    def restore_created_times(self, model, objects, created_times):
+        # auto_now_add overrides created_time in bulk_create, the source value is written back
+        restored = []
+        for obj, created_time in zip(objects, created_times):
+            if created_time is not None:
+                obj.created_time = created_time
+                restored.append(obj)
+        if restored:
+            model.objects.bulk_update(restored, ['created_time'])
+
+    def insert_projects(self, users):
+        records = self.buffers['project']
+        if not records:
+            return
+        projects = [
+            Project(
+                id=self.integer(record, 'id', line_number),
+                name=self.field(record, 'name', line_number),
+                description=record.get('description', ''),
+                type=self.choice(record, 'type', TYPE_CHOICES, line_number),
+                author_id=self.user_id(users, self.field(record, 'author', line_number), line_number),
+            )
+            for line_number, record in records
+        ]
+        Project.objects.bulk_create(projects)
+        changelog.record_objects(projects, changelog.CREATED)
+        self.restore_created_times(Project, projects, [parse_time(record.get('created_time'), line_number) for line_number, record in records])
+        # add_author_as_contributor
+        self.ensure_contributors({(project.id, project.author_id) for project in projects})
+        self.counts['project'] += len(projects)
+
+    def insert_contributors(self, users):
+        records = self.buffers['contributor']
+        if not records:
+            return
+        self.check_projects(records)
+        pairs = {
+            (self.field(record, 'project', line_number), self.user_id(users, self.field(record, 'user', line_number), line_number))
+            for line_number, record in records
+        }
+        self.ensure_contributors(pairs)
+        self.counts['contributor'] += len(pairs)
+
+    def insert_issues(self, users):
+        records = self.buffers['issue']
+        if not records:
+            return
+        self.check_projects(records)
+        pairs = set()
+        for line_number, record in records:
+            project_id = self.field(record, 'project', line_number)
+            pairs.add((project_id, self.user_id(users, self.field(record, 'author', line_number), line_number)))
+            for username in self.assignees(record, line_number):
+                pairs.add((project_id, self.user_id(users, username, line_number)))
+        contributors = self.ensure_contributors(pairs)
+
+        now = timezone.now()
+        issues = []
+        assignments = []
+        for line_number, record in records:
+            project_id = record['project']
+            issue = Issue(
+                id=self.integer(record, 'id', line_number),
+                project_id=project_id,
+                author_id=contributors[(project_id, users[record['author']])],
+                title=self.field(record, 'title', line_number),
+                description=record.get('description', ''),
+                status=self.choice(record, 'status', STATUS_CHOICES, line_number),
+                priority=self.choice(record, 'priority', PRIORITY_CHOICES, line_number),
+                tag=self.choice(record, 'tag', TAG_CHOICES, line_number),
+                updated_time=parse_time(record.get('updated_time'), line_number) or now,
+            )
+            issues.append(issue)
+            assignments += [
+                Issue.assignees.through(issue_id=issue.id, contributor_id=contributors[(project_id, users[username])])
+                for username in set(record.get('assignees', []))
+            ]
+        Issue.objects.bulk_create(issues)
+        Issue.assignees.through.objects.bulk_create(assignments)
+        changelog.record_objects(issues, changelog.CREATED)
+        self.restore_created_times(Issue, issues, [parse_time(record.get('created_time'), line_number) for line_number, record in records])
+        search.index_issues([issue.id for issue in issues], created=True)
+        self.counts['issue'] += len(issues)
+        self.counts['assignee'] += len(assignments)
+
+    def insert_comments(self, users):
+        records = self.buffers['comment']
+        if not records:
+            return
+        issue_ids = {self.integer(record, 'issue', line_number) for line_number, record in records}
+        issue_projects = dict(Issue.objects.filter(pk__in=issue_ids).values_list('id', 'project_id'))
+        pairs = set()
+        for line_number, record in records:
+            if record['issue'] not in issue_projects:
+                raise ImportFailed(f'line {line_number}: unknown issue {record["issue"]!r}')
+            pairs.add((issue_projects[record['issue']], self.user_id(users, self.field(record, 'author', line_number), line_number)))
+        contributors = self.ensure_contributors(pairs)
+
+        comments = [
+            Comment(
+                id=self.comment_id(record, line_number),
+                issue_id=record['issue'],
+                author_id=contributors[(issue_projects[record['issue']], users[record['author']])],
+                description=self.field(record, 'description', line_number),
+            )
+            for line_number, record in records
+        ]
+        Comment.objects.bulk_create(comments)
+        changelog.record([changelog.entry(comment, changelog.CREATED, issue_projects[comment.issue_id]) for comment in comments])
+        self.restore_created_times(Comment, comments, [parse_time(record.get('created_time'), line_number) for line_number, record in records])
+        search.index_comments([comment.id for comment in comments], created=True)
+
+        # update_issue_updated_time, applied once per issue of the batch
+        comments_of_issue = Comment.objects.filter(issue=OuterRef('pk')).order_by().values('issue')
+        Issue.objects.filter(pk__in=issue_ids).update(
+            comments_count=Coalesce(Subquery(comments_of_issue.annotate(count=Count('pk')).values('count')), 0),
+            updated_time=Greatest(
+                F('updated_time'),
+                Coalesce(Subquery(comments_of_issue.annotate(latest=Max('created_time')).values('latest')), F('updated_time')),
+            ),
+        )
+        changelog.record([changelog.issue_entry(issue_id, project_id) for issue_id, project_id in issue_projects.items()])
+        self.counts['comment'] += len(comments)
+
+
+def import_file(path, batch_size=1000):
+    """Stream the NDJSON file at `path` into the database and return (counts, seconds)."""
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as ndjson_file:
+        counts = TrackerImporter(batch_size).import_lines(ndjson_file)
+    return counts, time.perf_counter() - start
@@ -0,0 +1,302 @@
+"""
+In-process load drivers.
+
+`run_wsgi` / `run_asgi` compare the WSGI and ASGI request paths over fixed
+URLs, `run_mix` replays a weighted mix of router routes as many users (see
+`parse_mix`, `load_targets`) and reports per route.
+
+Every run drives `concurrency` closed-loop clients, each sending its share
+of `requests` one after the other:
+
+- WSGI: every client is a thread using the test Client (WSGI handler), and
+  at most `workers` requests are processed at once, like the worker threads
+  of a WSGI server. Waiting for a worker counts in the latency.
+- ASGI: every client is a task on one event loop using the AsyncClient, the
+  URLs being resolved with the async read views of softdesk.asgi_urls.
+
+The latencies are measured by the clients, from sending to the full response.
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client, AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from projects.models import Contributor, Issue, Comment
+from projects.profiling import percentile
+from softdesk.asgi import ASGI_URLCONF
+
+User = get_user_model()
+
+# One request of a client: `label` groups the latencies in the report
+Call = namedtuple('Call', ['label', 'method', 'url', 'data'])
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def client_urls(urls, requests, concurrency, client_index):
+    """The URLs sent by one client, spreading `requests` over the clients and the URLs."""
+    count = requests // concurrency + (1 if client_index < requests % concurrency else 0)
+    return list(itertools.islice(itertools.cycle(urls[client_index % len(urls):] + urls[:client_index % len(urls)]), count))
+
+
+def _send(http, call, headers):
+    if call.method == 'get':
+        return http.get(call.url, headers=headers)
+    return getattr(http, call.method)(call.url, json.dumps(call.data), content_type='application/json', headers=headers)
+
+
+def drive_wsgi(plans, workers):
+    """
+    Run every plan, a (headers, calls) pair, as a client thread of the WSGI
+    handler. Return the (label, latency, status) samples and the duration.
+    """
+    samples = []
+    lock = threading.Lock()
+    worker_slots = threading.BoundedSemaphore(workers)
+
+    def client(headers, calls):
+        # Server errors (e.g. SQLite 'database is locked') are counted, not raised
+        http = Client(raise_request_exception=False)
+        try:
+            for call in calls:
+                start = time.perf_counter()
+                with worker_slots:
+                    response = _send(http, call, headers)
+                latency = time.perf_counter() - start
+                with lock:
+                    samples.append((call.label, latency, response.status_code))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=client, args=plan) for plan in plans]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def drive_asgi(plans):
+    """drive_wsgi() with every client as a task of the AsyncClient on one event loop."""
+    samples = []
+
+    async def client(headers, calls):
+        http = AsyncClient(raise_request_exception=False)
+        for call in calls:
+            start = time.perf_counter()
+            # The AsyncClient default headers do not reach the ASGI scope
+            response = await _send(http, call, headers)
+            samples.append((call.label, time.perf_counter() - start, response.status_code))
+
+    async def main():
+        try:
+            await asyncio.gather(*(client(*plan) for plan in plans))
+        finally:
+            await sync_to_async(connections.close_all)()
+
+    with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+        start = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def report(samples, elapsed):
+    """summarize() the samples of every label, and of all of them under 'total'."""
+    labels = {}
+    for label, latency, status in samples:
+        labels.setdefault(label, []).append((latency, status))
+    results = {}
+    for label, measures in sorted(labels.items()):
+        results[label] = summarize([latency for latency, status in measures], sum(status >= 400 for _, status in measures), elapsed)
+    results['total'] = summarize([latency for _, latency, _ in samples], sum(status >= 400 for _, _, status in samples), elapsed)
+    return results
+
+
+def _fixed_plans(urls, headers, requests, concurrency):
+    return [
+        (headers, [Call('all', 'get', url, None) for url in client_urls(urls, requests, concurrency, client_index)])
+        for client_index in range(concurrency)
+    ]
+
+
+def run_wsgi(urls, headers, requests, concurrency, workers):
+    samples, elapsed = drive_wsgi(_fixed_plans(urls, headers, requests, concurrency), workers)
+    return report(samples, elapsed)['total']
+
+
+def run_asgi(urls, headers, requests, concurrency):
+    samples, elapsed = drive_asgi(_fixed_plans(urls, headers, requests, concurrency))
+    return report(samples, elapsed)['total']
+
+
+# Labels of the mix: the router routes (GET) and the writes, which add rows
+# to the target database and are left out of the default mix
+WRITE_ROUTES = {
+    'issue-create': ('post', 'issue-list'),
+    'comment-create': ('post', 'comment-list'),
+}
+DEFAULT_MIX = {
+    'project-list': 2,
+    'project-detail': 3,
+    'issue-list': 6,
+    'issue-detail': 3,
+    'comment-list': 5,
+    'comment-detail': 1,
+    'sync-list': 1,
+}
+
+
+def mix_routes():
+    """The labels a mix may use."""
+    from softdesk.urls import router
+
+    routes = set(WRITE_ROUTES)
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            routes.add(f'{basename}-list')
+        if hasattr(viewset, 'retrieve'):
+            routes.add(f'{basename}-detail')
+    return routes
+
+
+def parse_mix(text):
+    """Parse 'issue-list=5,comment-list=3' into {label: weight}, raise ValueError when invalid."""
+    mix = {}
+    routes = mix_routes()
+    for item in filter(None, (item.strip() for item in text.split(','))):
+        label, _, weight = item.partition('=')
+        if label not in routes:
+            raise ValueError(f"unknown route {label!r}, expected one of {', '.join(sorted(routes))}")
+        try:
+            mix[label] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f'invalid weight {weight!r} for {label}')
+        if mix[label] < 0:
+            raise ValueError(f'negative weight for {label}')
+    if not any(mix.values()):
+        raise ValueError('empty mix')
+    return mix
+
+
+WRITE_DATA = {
+    'issue-create': {'title': 'Load test', 'description': 'Load test issue', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'},
+    'comment-create': {'description': 'Load test comment'},
+}
+
+
+class Target:
+    """A user of the load with its JWT, and rows of its projects to build the URLs with."""
+
+    def __init__(self, user, contributor_ids, issues, comments):
+        self.user = user
+        self.headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(user).access_token)}
+        # {project id: contributor id}, {project id: [issue ids]}, {(project id, issue id): [comment ids]}
+        self.contributor_ids = contributor_ids
+        self.issues = issues
+        self.comments = comments
+        self.project_ids = sorted(contributor_ids)
+
+    def route_kwargs(self, basename, detail, rng):
+        """URL kwargs of the route, IndexError when the projects of the target have no row for it."""
+        if basename == 'project':
+            return {'pk': rng.choice(self.project_ids)} if detail else {}
+        if basename == 'issue':
+            project_id = rng.choice(self.project_ids)
+            return {'project_pk': project_id, 'pk': rng.choice(self.issues[project_id])} if detail else {'project_pk': project_id}
+        if basename == 'comment':
+            project_id, issue_id = rng.choice(sorted(self.comments))
+            kwargs = {'project_pk': project_id, 'issue_pk': issue_id}
+            if detail:
+                kwargs['pk'] = rng.choice(self.comments[(project_id, issue_id)])
+            return kwargs
+        if detail:
+            return {'pk': self.user.pk if basename == 'user' else rng.choice(list(self.contributor_ids.values()))}
+        return {}
+
+    def call(self, label, rng):
+        """A Call to `label`, None when the target has no row to call it with."""
+        method, route = WRITE_ROUTES.get(label, ('get', label))
+        basename, kind = route.rsplit('-', 1)
+        try:
+            kwargs = self.route_kwargs(basename, kind == 'detail', rng)
+        except IndexError:
+            return None
+        return Call(label, method, reverse(route, kwargs=kwargs), WRITE_DATA.get(label))
+
+
+def load_targets(count, rng, sample_size=20):
+    """
+    Pick `count` contributing users at random, with up to `sample_size`
+    issues per project and comments per issue to address.
+    """
+    user_ids = sorted(set(Contributor.objects.values_list('user_id', flat=True)))
+    targets = []
+    for user in User.objects.filter(pk__in=rng.sample(user_ids, min(count, len(user_ids)))).order_by('pk'):
+        contributor_ids = dict(Contributor.objects.filter(user=user).values_list('project_id', 'id'))
+        issues = {}
+        comments = {}
+        for project_id in contributor_ids:
+            issue_ids = list(Issue.objects.filter(project_id=project_id).order_by('-updated_time').values_list('id', flat=True)[:sample_size])
+            issues[project_id] = issue_ids
+            for issue_id in issue_ids[:3]:
+                comments[(project_id, issue_id)] = list(
+                    Comment.objects.filter(issue_id=issue_id).order_by('-created_time').values_list('id', flat=True)[:sample_size]
+                )
+        targets.append(Target(user, contributor_ids, issues, comments))
+    return targets
+
+
+def plan_mix(targets, mix, requests, concurrency, seed=0, attempts=100):
+    """
+    The plans of `concurrency` clients, each one acting as one target and
+    drawing its share of `requests` calls from the weighted mix. Routes a
+    target has no row for are drawn again.
+    """
+    rng = random.Random(seed)
+    labels = list(mix)
+    weights = [mix[label] for label in labels]
+    plans = []
+    for client_index in range(concurrency):
+        target = targets[client_index % len(targets)]
+        count = requests // concurrency + (1 if client_index < requests % concurrency else 0)
+        calls = []
+        misses = 0
+        while len(calls) < count:
+            call = target.call(rng.choices(labels, weights)[0], rng)
+            if call is None:
+                misses += 1
+                if misses == attempts:
+                    raise ValueError(f'{target.user.username} has no data for the routes of the mix')
+                continue
+            calls.append(call)
+        plans.append((target.headers, calls))
+    return plans
+
+
+def run_mix(targets, mix, requests, concurrency, workers, asgi=False, seed=0):
+    """Replay the mix and return report() of the samples, per label."""
+    plans = plan_mix(targets, mix, requests, concurrency, seed)
+    samples, elapsed = drive_asgi(plans) if asgi else drive_wsgi(plans, workers)
+    return report(samples, elapsed)
@@ -0,0 +1,57 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from projects.benchmarks import seed
+from projects.load import run_wsgi, run_asgi
+
+ROUTES = ('project-detail', 'issue-list', 'comment-list')
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway test database and compare the WSGI and ASGI read paths under concurrent load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=100, help="Concurrent clients.")
+        parser.add_argument('--workers', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--routes', nargs='+', default=list(ROUTES))
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Committed, the clients read it from their own connections
+            dataset = seed(options['size'])
+            urls = [
+                reverse(name, kwargs=dataset.route_kwargs(name.split('-')[0], name.endswith('-detail')))
+                for name in options['routes']
+            ]
+            headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(dataset.owner).access_token)}
+
+            results = {}
+            for mode in ('wsgi', 'asgi'):
+                for alias in caches:
+                    caches[alias].clear()
+                if mode == 'wsgi':
+                    results[mode] = run_wsgi(urls, headers, options['requests'], options['concurrency'], options['workers'])
+                else:
+                    results[mode] = run_asgi(urls, headers, options['requests'], options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"size={options['size']} requests={options['requests']} concurrency={options['concurrency']} "
+            f"wsgi workers={options['workers']} routes={' '.join(options['routes'])}"
+        )
+        self.stdout.write(f'{"mode":<6} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<6} {result["throughput_rps"]:>8} {result["p50_ms"]:>9} '
+                f'{result["p95_ms"]:>9} {result["p99_ms"]:>9} {result["errors"]:>7}'
+            )
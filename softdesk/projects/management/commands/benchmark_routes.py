@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from projects.benchmarks import DEFAULT_SIZES, BUDGETS_FILE, seed, measure_routes, load_budgets, check_budgets
+
+
+class Command(BaseCommand):
+    help = "Seed scaled fixtures in a throwaway test database and check every API route against its query budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+        parser.add_argument('--budgets', default=str(BUDGETS_FILE))
+
+    def handle(self, *args, **options):
+        budgets = load_budgets(options['budgets'])
+        violations = []
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in options['sizes']:
+                with transaction.atomic():
+                    dataset = seed(size)
+                    results = measure_routes(dataset)
+                    transaction.set_rollback(True)
+
+                self.stdout.write(f'\nsize={size}')
+                self.stdout.write(f'{"route":<20} {"status":>6} {"queries":>8} {"db ms":>10} {"wall ms":>10}')
+                for name, result in results.items():
+                    self.stdout.write(
+                        f'{name:<20} {result["status"]:>6} {result["queries"]:>8} '
+                        f'{result["db_time_ms"]:>10} {result["wall_time_ms"]:>10}'
+                    )
+                violations += [f'size={size} {violation}' for violation in check_budgets(results, budgets)]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if violations:
+            raise CommandError('Query budgets exceeded:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('\nAll routes are within their query budgets.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from projects.benchmarks import seed, find_full_scans
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN QUERY PLAN on the queries of every API route and fail on full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans only supports SQLite.')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with transaction.atomic():
+                scans = find_full_scans(seed(options['size']))
+                transaction.set_rollback(True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if scans:
+            raise CommandError('Full table scans found:\n' + '\n'.join(
+                f'{route}: SCAN {table}\n    {sql}' for route, table, sql in scans
+            ))
+        self.stdout.write(self.style.SUCCESS('No full table scan in the API query plans.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.importer import ImportFailed, import_file
+
+
+class Command(BaseCommand):
+    help = "Stream an NDJSON export of projects, contributors, issues and comments into the database (see projects.importer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            counts, seconds = import_file(options['path'], options['batch_size'])
+        except (ImportFailed, OSError) as error:
+            raise CommandError(f'Import failed: {error}')
+
+        total = sum(counts.values())
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} rows imported in {seconds:.2f}s ({total / seconds if seconds else total:.0f} rows/s)'
+        ))
@@ -0,0 +1,66 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from projects.load import DEFAULT_MIX, load_targets, parse_mix, plan_mix, drive_asgi, drive_wsgi, report
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted mix of JWT-authenticated API calls with concurrent clients against the database "
+        "(fill it with seed_data first) and report the throughput and p50/p95/p99 per route."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mix', default=','.join(f'{label}={weight}' for label, weight in DEFAULT_MIX.items()),
+            help=(
+                "Comma separated route=weight, routes are the router route names plus issue-create and "
+                "comment-create. The default mix only reads; the write routes add issues and comments to the "
+                "target database."
+            ),
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent clients.")
+        parser.add_argument('--workers', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--users', type=int, default=20, help="Distinct users the clients act as.")
+        parser.add_argument('--asgi', action='store_true', help="Drive the ASGI application instead of the WSGI one.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(f'Invalid --mix: {error}')
+        targets = load_targets(options['users'], random.Random(options['seed']))
+        if not targets:
+            raise CommandError('No contributor in the database, run seed_data first.')
+        try:
+            plans = plan_mix(targets, mix, options['requests'], options['concurrency'], options['seed'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        # The test clients send requests to 'testserver'
+        setup_test_environment()
+        try:
+            if options['asgi']:
+                samples, elapsed = drive_asgi(plans)
+            else:
+                samples, elapsed = drive_wsgi(plans, options['workers'])
+        finally:
+            teardown_test_environment()
+        results = report(samples, elapsed)
+
+        mode = 'asgi' if options['asgi'] else f"wsgi workers={options['workers']}"
+        self.stdout.write(
+            f"{mode} requests={options['requests']} concurrency={options['concurrency']} users={len(targets)} "
+            f"elapsed={elapsed:.2f}s"
+        )
+        width = max(len(label) for label in results)
+        self.stdout.write(f'{"route":<{width}} {"requests":>8} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for label, result in results.items():
+            self.stdout.write(
+                f'{label:<{width}} {result["requests"]:>8} {result["throughput_rps"]:>8} {result["p50_ms"]:>9} '
+                f'{result["p95_ms"]:>9} {result["p99_ms"]:>9} {result["errors"]:>7}'
+            )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from projects import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the issues and comments."
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                documents = search.rebuild()
+        except search.Unavailable as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'{documents} document(s) indexed.'))
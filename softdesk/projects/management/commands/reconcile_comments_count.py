@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from projects import changelog
+from projects.models import Issue, Comment
+from projects.response_cache import project_response_cache
+
+
+class Command(BaseCommand):
+    help = "Recompute Issue.comments_count where it drifted from the actual number of comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drifted issues.")
+
+    def handle(self, *args, **options):
+        counts = (
+            Comment.objects.filter(issue=OuterRef('pk'))
+            .order_by().values('issue').annotate(count=Count('pk')).values('count')
+        )
+        actual_count = Coalesce(Subquery(counts), 0)
+        drifted = Issue.objects.annotate(actual_count=actual_count).exclude(comments_count=F('actual_count'))
+
+        if options['dry_run']:
+            for issue_id, stored, actual in drifted.values_list('id', 'comments_count', 'actual_count'):
+                self.stdout.write(f'issue {issue_id}: {stored} stored, {actual} actual')
+            self.stdout.write(f'{drifted.count()} issue(s) drifted.')
+            return
+
+        issues = dict(drifted.values_list('id', 'project_id'))
+        with transaction.atomic():
+            fixed = Issue.objects.filter(pk__in=drifted.values('pk')).update(comments_count=actual_count)
+            changelog.record([changelog.issue_entry(issue_id, project_id) for issue_id, project_id in issues.items()])
+        project_response_cache.bump(set(issues.values()))
+        self.stdout.write(self.style.SUCCESS(f'{fixed} issue(s) reconciled.'))
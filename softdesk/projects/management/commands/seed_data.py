@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from projects.seeding import generate
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate users, projects with skewed contributor counts, issues and long comment threads (see projects.seeding)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--issues', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--max-contributors', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, the same seed generates the same data.")
+        parser.add_argument('--prefix', default='seed', help="Username prefix, change it to seed the same database again.")
+        parser.add_argument('--password', help="Password of every generated user (unusable by default).")
+        parser.add_argument('--no-search-index', action='store_true', help="Skip the full-text index rebuild.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 and options['projects'] > 0:
+            raise CommandError('Projects need at least one user.')
+        start = time.perf_counter()
+        try:
+            counts = generate(
+                options['users'], options['projects'], options['issues'], options['comments'],
+                max_contributors=options['max_contributors'], seed=options['seed'], prefix=options['prefix'],
+                password=options['password'], index_search=not options['no_search_index'],
+            )
+        except IntegrityError as error:
+            raise CommandError(f'Seeding failed ({error}), use another --prefix.')
+        seconds = time.perf_counter() - start
+
+        total = sum(counts.values())
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} rows generated in {seconds:.2f}s ({total / seconds if seconds else total:.0f} rows/s)'
+        ))
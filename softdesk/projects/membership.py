@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from projects.metrics import count_cache_lookup
+from projects.models import Contributor, Project, Issue, Comment
+
+# Cached for users who are not contributors, None means "not in cache"
+NOT_A_CONTRIBUTOR = 0
+
+
+def _project_key(project_id):
+    try:
+        return int(project_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def membership_cache_key(user_id, project_id):
+    return f'project-membership:{user_id}:{project_id}'
+
+
+def invalidate_memberships(project_id, user_ids):
+    """
+    Drop the cached memberships of `user_ids` in the project, now and once
+    the current transaction commits so that a concurrent read cannot cache
+    the old state again.
+    """
+    keys = [membership_cache_key(user_id, project_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def load_contributor_id(user_id, project_id):
+    """The Contributor id of the user in the project through the cache, None if not a contributor."""
+    key = membership_cache_key(user_id, project_id)
+    contributor_id = count_cache_lookup('memberships', cache.get(key))
+    if contributor_id is None:
+        contributor_id = (
+            Contributor.objects
+            .filter(project_id=project_id, user_id=user_id)
+            .values_list('id', flat=True)
+            .first()
+        ) or NOT_A_CONTRIBUTOR
+        cache.set(key, contributor_id, settings.PROJECT_MEMBERSHIP_CACHE_TIMEOUT)
+    return contributor_id or None
+
+
+async def aload_contributor_id(user_id, project_id):
+    key = membership_cache_key(user_id, project_id)
+    contributor_id = count_cache_lookup('memberships', await cache.aget(key))
+    if contributor_id is None:
+        contributor_id = await (
+            Contributor.objects
+            .filter(project_id=project_id, user_id=user_id)
+            .values_list('id', flat=True)
+            .afirst()
+        ) or NOT_A_CONTRIBUTOR
+        await cache.aset(key, contributor_id, settings.PROJECT_MEMBERSHIP_CACHE_TIMEOUT)
+    return contributor_id or None
+
+
+def _request_memberships(request):
+    memberships = getattr(request, '_project_memberships', None)
+    if memberships is None:
+        memberships = request._project_memberships = {}
+    return memberships
+
+
+def get_contributor_id(request, project_id):
+    """
+    Return the Contributor id of `request.user` in the project, or None if the
+    user does not contribute to it. The result is shared between requests
+    through the cache and resolved at most once per project and per request,
+    permissions and views share it.
+    """
+    project_key = _project_key(project_id)
+    if project_key is None or not request.user.is_authenticated:
+        return None
+
+    memberships = _request_memberships(request)
+    if project_key not in memberships:
+        memberships[project_key] = load_contributor_id(request.user.pk, project_key)
+    return memberships[project_key]
+
+
+async def aget_contributor_id(request, project_id):
+    """get_contributor_id() for the async views, sharing the same caches."""
+    project_key = _project_key(project_id)
+    if project_key is None or not request.user.is_authenticated:
+        return None
+
+    memberships = _request_memberships(request)
+    if project_key not in memberships:
+        memberships[project_key] = await aload_contributor_id(request.user.pk, project_key)
+    return memberships[project_key]
+
+
+def get_contributor(request, project_id):
+    """
+    Return the Contributor of `request.user` in the project without loading
+    the row again, or None if the user does not contribute to it.
+    """
+    contributor_id = get_contributor_id(request, project_id)
+    if contributor_id is None:
+        return None
+    return Contributor(id=contributor_id, user=request.user, project_id=_project_key(project_id))
+
+
+def get_object_project_id(obj):
+    """Return the project id of a Project, Issue or Comment."""
+    if isinstance(obj, Project):
+        return obj.pk
+    elif isinstance(obj, Issue):
+        return obj.project_id
+    elif isinstance(obj, Comment):
+        return obj.issue.project_id
+    return None
@@ -0,0 +1,149 @@
+"""
+Prometheus metrics of the API, exported by `GET /metrics`.
+
+- `softdesk_http_requests_total` and `softdesk_http_request_duration_seconds`:
+  requests and latency per route, method, viewset action (and status),
+- `softdesk_db_queries_per_request`: queries per request and route,
+- `softdesk_pagination_page_size`: rows in the pages served per route,
+- `softdesk_jwt_authentications_total`: CustomJWTAuthentication outcomes,
+- `softdesk_cache_lookups_total`: hits and misses of the user, membership
+  and response caches,
+- `softdesk_signal_handler_duration_seconds`: the `timed_handler` signal
+  handlers (add_author_as_contributor, update_issue_updated_time).
+
+`MetricsMiddleware` goes right after the ProfilingMiddleware, whose
+Profile of the request (projects/profiling.py) gives the query count and
+the page size; without it only the request metrics are recorded.
+
+Under gunicorn, every worker keeps its own values: set
+PROMETHEUS_MULTIPROC_DIR to an empty directory, shared by the workers and
+emptied before the server starts, so that the workers write their values
+there and `/metrics` adds them up whichever worker serves it. Only counters
+and histograms are used, which need no clean-up when a worker exits.
+"""
+import functools
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from projects import profiling
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+PAGE_SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+SIGNAL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+REQUESTS = Counter(
+    'softdesk_http_requests', 'HTTP requests per route.', ['route', 'method', 'action', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'softdesk_http_request_duration_seconds', 'HTTP request latency per route.', ['route', 'method', 'action'],
+)
+DB_QUERIES = Histogram(
+    'softdesk_db_queries_per_request', 'SQL queries per request.', ['route', 'method', 'action'], buckets=QUERY_BUCKETS,
+)
+PAGE_SIZE = Histogram(
+    'softdesk_pagination_page_size', 'Rows in the paginated responses.', ['route', 'action'], buckets=PAGE_SIZE_BUCKETS,
+)
+JWT_AUTHENTICATIONS = Counter(
+    'softdesk_jwt_authentications', 'JWT authentication outcomes.', ['outcome'],
+)
+CACHE_LOOKUPS = Counter(
+    'softdesk_cache_lookups', 'Cache lookups.', ['cache', 'result'],
+)
+SIGNAL_HANDLER_DURATION = Histogram(
+    'softdesk_signal_handler_duration_seconds', 'Duration of the signal handlers.', ['handler'], buckets=SIGNAL_BUCKETS,
+)
+
+# JWT outcomes
+AUTHENTICATED = 'authenticated'
+NO_TOKEN = 'no_token'
+INVALID_TOKEN = 'invalid_token'
+REJECTED = 'rejected'
+
+
+def count_jwt(outcome):
+    JWT_AUTHENTICATIONS.labels(outcome).inc()
+
+
+def count_cache_lookup(cache, value):
+    """Count a hit or a miss (`value` is None) of the cache and return `value`."""
+    CACHE_LOOKUPS.labels(cache, 'miss' if value is None else 'hit').inc()
+    return value
+
+
+def timed_handler(handler):
+    """Record the duration of a signal handler, to be put under its @receiver."""
+    histogram = SIGNAL_HANDLER_DURATION.labels(handler.__name__)
+
+    @functools.wraps(handler)
+    def timed(*args, **kwargs):
+        with histogram.time():
+            return handler(*args, **kwargs)
+    return timed
+
+
+def registry():
+    """The registry of this process, or of all the workers writing to PROMETHEUS_MULTIPROC_DIR."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def metrics_view(request):
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def route_labels(request):
+    """The route name and viewset action of the request, empty when not resolved."""
+    match = request.resolver_match
+    if match is None:
+        return '', ''
+    actions = getattr(match.func, 'actions', None) or {}
+    return match.view_name, actions.get(request.method.lower(), '')
+
+
+class MetricsMiddleware:
+    """Records the request metrics, disabled by METRICS_ENABLED = False."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, duration):
+        route, action = route_labels(request)
+        REQUESTS.labels(route, request.method, action, response.status_code).inc()
+        REQUEST_DURATION.labels(route, request.method, action).observe(duration)
+        profile = profiling.current()
+        if profile is None:
+            return
+        DB_QUERIES.labels(route, request.method, action).observe(profile.queries)
+        if profile.page_size is not None:
+            PAGE_SIZE.labels(route, action).observe(profile.page_size)
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE projects_search USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+        'SELECT project_id, id, NULL FROM projects_issue'
+    )
+    schema_editor.execute(
+        'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+        'SELECT i.project_id, c.issue_id, c.id FROM projects_comment c '
+        'INNER JOIN projects_issue i ON i.id = c.issue_id'
+    )
+    schema_editor.execute(
+        'INSERT INTO projects_search (rowid, title, body) '
+        'SELECT d.id, i.title, i.description FROM projects_searchdocument d '
+        'INNER JOIN projects_issue i ON i.id = d.issue_id WHERE d.comment_id IS NULL'
+    )
+    schema_editor.execute(
+        'INSERT INTO projects_search (rowid, title, body) '
+        "SELECT d.id, '', c.description FROM projects_searchdocument d "
+        'INNER JOIN projects_comment c ON c.id = d.comment_id'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE projects_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='projects.comment')),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='projects.issue')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='projects.project')),
+            ],
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
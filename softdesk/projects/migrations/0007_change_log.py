@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def log_existing_rows(apps, schema_editor):
+    """Log the existing rows as created, so that a sync from 0 downloads them."""
+    ChangeLog = apps.get_model('projects', 'ChangeLog')
+    rows = [
+        ('project', apps.get_model('projects', 'Project').objects.values_list('id', 'id')),
+        ('contributor', apps.get_model('projects', 'Contributor').objects.values_list('project_id', 'id', 'user_id')),
+        ('issue', apps.get_model('projects', 'Issue').objects.values_list('project_id', 'id')),
+        ('comment', apps.get_model('projects', 'Comment').objects.values_list('issue__project_id', 'id')),
+    ]
+    batch = []
+    for model, queryset in rows:
+        # (project id, object id) and the user id of the contributors
+        for project_id, object_id, *user_id in queryset.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(ChangeLog(
+                model=model, action='created', project_id=project_id, object_id=str(object_id), user_id=next(iter(user_id), None),
+            ))
+            if len(batch) == BATCH_SIZE:
+                ChangeLog.objects.bulk_create(batch)
+                batch = []
+    ChangeLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('project_id', models.IntegerField()),
+                ('model', models.CharField(choices=[('project', 'Project'), ('contributor', 'Contributor'), ('issue', 'Issue'), ('comment', 'Comment')], max_length=20)),
+                ('object_id', models.CharField(max_length=36)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=20)),
+                ('user_id', models.IntegerField(null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project_id', 'seq'], name='changelog_project_seq_idx'), models.Index(fields=['user_id', 'seq'], name='changelog_user_seq_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_delete_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Drops the text of the documents deleted by cascade in bulk, without a
+    # post_delete signal per document
+    schema_editor.execute(
+        'CREATE TRIGGER projects_searchdocument_delete AFTER DELETE ON projects_searchdocument '
+        'BEGIN DELETE FROM projects_search WHERE rowid = old.id; END'
+    )
+
+
+def drop_delete_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TRIGGER projects_searchdocument_delete')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_delete_trigger, drop_delete_trigger),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_contributors(apps, schema_editor):
+    """
+    Merge the Contributor rows of a same (user, project) into the oldest one,
+    the issues, comments and assignments of the others moving to it, so that
+    the unique constraint can be added.
+    """
+    Contributor = apps.get_model('projects', 'Contributor')
+    Issue = apps.get_model('projects', 'Issue')
+    Comment = apps.get_model('projects', 'Comment')
+    Assignment = Issue.assignees.through
+    duplicates = (
+        Contributor.objects.values('user', 'project')
+        .annotate(count=Count('pk'), kept=Min('pk'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        kept = duplicate['kept']
+        merged = list(
+            Contributor.objects.filter(user=duplicate['user'], project=duplicate['project'])
+            .exclude(pk=kept).values_list('pk', flat=True)
+        )
+        Issue.objects.filter(author_id__in=merged).update(author_id=kept)
+        Comment.objects.filter(author_id__in=merged).update(author_id=kept)
+        # An issue assigned to several of the rows keeps a single assignment
+        for assignment in Assignment.objects.filter(contributor_id__in=merged).order_by('pk'):
+            if Assignment.objects.filter(contributor_id=kept, issue_id=assignment.issue_id).exists():
+                assignment.delete()
+            else:
+                Assignment.objects.filter(pk=assignment.pk).update(contributor_id=kept)
+        Contributor.objects.filter(pk__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_search_delete_trigger'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_contributors, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='contributor',
+            unique_together={('user', 'project')},
+        ),
+    ]
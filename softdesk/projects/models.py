@@ -5,6 +5,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
 
+from projects.metrics import timed_handler
+
 
 
 TYPE_CHOICES = [
@@ -40,6 +42,7 @@ class Project(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='authored_projects')
     contributors = models.ManyToManyField(settings.AUTH_USER_MODEL, through='Contributor', related_name='contributed_projects')
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -50,6 +53,8 @@ class Contributor(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
 
     class Meta:
+        # (user, project) also serves the lookups by user alone, the index
+        # of the project foreign key the lookups by project
         unique_together = ('user', 'project')
 
     def __str__(self):
@@ -58,6 +63,7 @@ class Contributor(models.Model):
 
 # Signal to add the project author as a contributor
 @receiver(post_save, sender=Project)
+@timed_handler
 def add_author_as_contributor(sender, instance, created, **kwargs):
     if created:
         Contributor.objects.create(user=instance.author, project=instance)
@@ -74,6 +80,19 @@ class Issue(models.Model):
     tag = models.CharField(max_length=50, choices=TAG_CHOICES)
     created_time = models.DateTimeField(auto_now_add=True)
     updated_time = models.DateTimeField(default=timezone.now)
+    # Maintenu par les signaux des Comment, voir la commande reconcile_comments_count
+    comments_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of the issues of a project
+            models.Index(fields=['project', 'updated_time', 'id'], name='issue_project_updated_idx'),
+            models.Index(fields=['project', 'created_time', 'id'], name='issue_project_created_idx'),
+            # Equality filters of IssueFilter, in the default updated_time order
+            models.Index(fields=['project', 'status', 'updated_time'], name='issue_project_status_idx'),
+            models.Index(fields=['project', 'priority', 'updated_time'], name='issue_project_priority_idx'),
+            models.Index(fields=['project', 'tag', 'updated_time'], name='issue_project_tag_idx'),
+        ]
 
     def __str__(self):
         return f"{self.project.name} - {self.title}"
@@ -85,15 +104,61 @@ class Comment(models.Model):
     author = models.ForeignKey(Contributor, on_delete=models.CASCADE, related_name='comments')
     description = models.TextField(max_length=300)
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of the comments of an issue
+            models.Index(fields=['issue', 'created_time', 'id'], name='comment_issue_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author.user.username} - {self.description[:20]}"
 
 
+class SearchDocument(models.Model):
+    """
+    Issue (comment empty) or comment indexed for the full-text search. Its
+    id is the rowid of the document text in the projects_search FTS5 table,
+    see projects/search.py.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='+')
+    comment = models.OneToOneField(Comment, on_delete=models.CASCADE, null=True, related_name='+')
 
 
+CHANGE_MODEL_CHOICES = [
+    ('project', 'Project'),
+    ('contributor', 'Contributor'),
+    ('issue', 'Issue'),
+    ('comment', 'Comment')
+]
 
-    
+CHANGE_ACTION_CHOICES = [
+    ('created', 'Created'),
+    ('updated', 'Updated'),
+    ('deleted', 'Deleted')
+]
 
 
+class ChangeLog(models.Model):
+    """
+    Append-only log of the writes to the projects, contributors, issues and
+    comments, read by the sync endpoint, see projects/changelog.py. `seq`
+    only increases (AUTOINCREMENT on SQLite) and the project is a plain id
+    so that the entries outlive their project.
+    """
+    seq = models.BigAutoField(primary_key=True)
+    project_id = models.IntegerField()
+    model = models.CharField(max_length=20, choices=CHANGE_MODEL_CHOICES)
+    object_id = models.CharField(max_length=36)
+    action = models.CharField(max_length=20, choices=CHANGE_ACTION_CHOICES)
+    # User of the contributor entries, tells the users the projects they left
+    user_id = models.IntegerField(null=True)
+    created_time = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'seq'], name='changelog_project_seq_idx'),
+            models.Index(fields=['user_id', 'seq'], name='changelog_user_seq_idx'),
+        ]
@@ -0,0 +1,110 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    CursorPagination whose cursor holds the values of every ordering field
+    of the row at the edge of the page, instead of the first field and an
+    offset. The ordering ends with the unique id (see StableOrderingFilter),
+    so the following page is a single (a, b, ...) > (x, y, ...) comparison
+    however many rows share the same updated_time: DRF would OFFSET through
+    such a tie, as left by a bulk update.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (self.cursor.reverse, self.cursor.position) if self.cursor else (False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(ordering, position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def keyset_filter(self, ordering, position):
+        """The rows after `position` in `ordering`: a > x or (a = x and b > y) or ..."""
+        condition = None
+        for order, value in reversed(list(zip(ordering, position))):
+            field = order.lstrip('-')
+            after = Q(**{f"{field}__{'lt' if order.startswith('-') else 'gt'}": value})
+            condition = after if condition is None else after | (Q(**{field: value}) & condition)
+        # The bound on the first field alone lets the index serve a range scan
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & condition
+
+    def get_position_from_instance(self, instance):
+        return json.dumps([
+            str(instance[order.lstrip('-')] if isinstance(instance, dict) else getattr(instance, order.lstrip('-')))
+            for order in self.ordering
+        ])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        # An empty page before the first row leads back to the first page
+        position = self.get_position_from_instance(self.page[-1]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        # An empty page after the last row leads back to the last page
+        position = self.get_position_from_instance(self.page[0]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering) or not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+
+class IssueCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination walking the issues of a project by (updated_time, id),
+    most recently updated first like the IssueViewset default ordering.
+    """
+    ordering = ('-updated_time', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CommentCursorPagination(KeysetCursorPagination):
+    """Keyset pagination walking the comments of an issue by (created_time, id)."""
+    ordering = ('created_time', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
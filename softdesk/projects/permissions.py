@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission
 
-from projects.models import Contributor, Project, Issue, Comment
+from projects.models import Project
+from projects.membership import get_contributor_id, aget_contributor_id, get_object_project_id
 
 
 
@@ -12,30 +13,40 @@ class IsOwner(BasePermission):
 class IsAuthor(BasePermission):
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Project):
-            is_author = obj.author == request.user
-        else:  # obj is Issue or Comment
-            is_author = obj.author.user == request.user
+            is_author = obj.author_id == request.user.pk
+        else:  # obj is Issue or Comment, authored by a Contributor of its project
+            contributor_id = get_contributor_id(request, get_object_project_id(obj))
+            is_author = contributor_id is not None and obj.author_id == contributor_id
         return is_author
 
 
 class IsProjectContributor(BasePermission):
     """
     Permission class to check if the user is a contributor to the project.
+    The membership is resolved once per request and shared with IsAuthor
+    and the views.
     """
 
     def has_permission(self, request, view):
         project_pk = view.kwargs.get('project_pk') or view.kwargs.get('pk')
-        is_contributor = Contributor.objects.filter(project_id=project_pk, user=request.user).exists()
+        is_contributor = get_contributor_id(request, project_pk) is not None
+        return is_contributor
+
+    async def ahas_permission(self, request, view):
+        project_pk = view.kwargs.get('project_pk') or view.kwargs.get('pk')
+        is_contributor = await aget_contributor_id(request, project_pk) is not None
         return is_contributor
     
     def has_object_permission(self, request, view, obj):
-        if isinstance(obj, Project):
-            is_contributor = Contributor.objects.filter(project=obj, user=request.user).exists()
-            return is_contributor
-        elif isinstance(obj, Issue):
-            is_contributor = Contributor.objects.filter(project=obj.project, user=request.user).exists()
-            return is_contributor
-        elif isinstance(obj, Comment):
-            is_contributor = Contributor.objects.filter(project=obj.issue.project, user=request.user).exists()
-            return is_contributor
-        return False
+        project_id = get_object_project_id(obj)
+        if project_id is None:
+            return False
+        is_contributor = get_contributor_id(request, project_id) is not None
+        return is_contributor
+
+    async def ahas_object_permission(self, request, view, obj):
+        project_id = get_object_project_id(obj)
+        if project_id is None:
+            return False
+        is_contributor = await aget_contributor_id(request, project_id) is not None
+        return is_contributor
@@ -0,0 +1,261 @@
+"""
+Per-request profiling of the API.
+
+`ProfilingMiddleware` gives every request a `Profile` which splits its
+duration into phases:
+
+- `auth`: authentication (CustomJWTAuthentication, sessions),
+- `permission`: the permission checks,
+- `queryset`: loading the page or the object,
+- `serialize`: the rest of the action, serialization for the reads (and the
+  evaluation of unpaginated querysets), validation and save for the writes,
+- `render`: rendering the response,
+- `db`: the SQL queries, whatever the phase running them,
+- `other`: the middlewares, URL resolution and content negotiation.
+
+The phases are exclusive (a query in `queryset` counts in `db` only) so they
+add up to the duration of the request. The DRF views time them with
+ProfilingMixin (projects/views.py), the async read views of
+projects/async_views.py with the same `phase` / `switch` helpers, which do
+nothing outside a profiled request.
+
+The durations go out in a `Server-Timing` header and into `route_profiles`,
+which keeps the last PROFILING_WINDOW requests of every route for
+`GET /api/profiling/` (staff only). Like the events, the aggregate is
+process-local.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+AUTH = 'auth'
+PERMISSION = 'permission'
+QUERYSET = 'queryset'
+SERIALIZE = 'serialize'
+RENDER = 'render'
+DB = 'db'
+OTHER = 'other'
+PHASES = (AUTH, PERMISSION, QUERYSET, SERIALIZE, RENDER, DB, OTHER)
+
+_current = ContextVar('profile', default=None)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Profile:
+    """
+    Durations of the phases of a request. The time elapsed is charged to the
+    innermost phase running: `enter` / `exit` nest a phase, `switch` changes
+    the outermost one.
+    """
+
+    def __init__(self):
+        self.start = self._last = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        # Rows in the page served, if any
+        self.page_size = None
+        self.total = None
+        self._stack = [OTHER]
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.durations[self._stack[-1]] += now - self._last
+        self._last = now
+
+    def enter(self, phase):
+        self._tick()
+        self._stack.append(phase)
+
+    def exit(self):
+        self._tick()
+        self._stack.pop()
+
+    def switch(self, phase):
+        self._tick()
+        self._stack[0] = phase
+
+    def finish(self):
+        self._tick()
+        self.total = self._last - self.start
+
+    def server_timing(self):
+        metrics = []
+        for phase in PHASES:
+            if phase == DB:
+                metrics.append(f'{DB};dur={self.durations[DB] * 1000:.2f};desc="{self.queries} queries"')
+            elif self.durations[phase]:
+                metrics.append(f'{phase};dur={self.durations[phase] * 1000:.2f}')
+        metrics.append(f'total;dur={self.total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+def current():
+    """The Profile of the request running, None outside a profiled request."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """Charge the time spent in the block to the phase `name`."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit()
+
+
+def switch(name):
+    """Charge the time from now on to the phase `name`."""
+    profile = _current.get()
+    if profile is not None:
+        profile.switch(name)
+
+
+def record_page(page):
+    profile = _current.get()
+    if profile is not None and page is not None:
+        profile.page_size = len(page)
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, charging the queries to `db`."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    profile.queries += 1
+    profile.enter(DB)
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.exit()
+
+
+def install_query_timer(connection):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+class RouteProfiles:
+    """Rolling window of the profiles of every route, `<method> <route name>`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._requests = {}
+
+    def add(self, route, profile):
+        sample = (profile.total, tuple(profile.durations[phase] for phase in PHASES), profile.queries)
+        with self._lock:
+            samples = self._samples.get(route)
+            if samples is None:
+                samples = self._samples[route] = deque(maxlen=settings.PROFILING_WINDOW)
+            samples.append(sample)
+            self._requests[route] = self._requests.get(route, 0) + 1
+
+    def summary(self):
+        """Per route: the request count and, over the window, the latency percentiles and the mean of every phase."""
+        with self._lock:
+            routes = {route: (self._requests[route], list(samples)) for route, samples in self._samples.items()}
+        summary = {}
+        for route, (requests, samples) in sorted(routes.items()):
+            totals = sorted(total for total, durations, queries in samples)
+            phases = {
+                phase: round(sum(durations[index] for total, durations, queries in samples) / len(samples) * 1000, 3)
+                for index, phase in enumerate(PHASES)
+            }
+            summary[route] = {
+                'requests': requests,
+                'window': len(samples),
+                'p50_ms': round(percentile(totals, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(totals, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(totals, 0.99) * 1000, 3),
+                'mean_ms': round(sum(totals) / len(totals) * 1000, 3),
+                'phases_ms': phases,
+                'dominant_phase': max(phases, key=phases.get),
+                'queries': round(sum(queries for total, durations, queries in samples) / len(samples), 2),
+            }
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._requests.clear()
+
+
+route_profiles = RouteProfiles()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles every request, to be listed first in MIDDLEWARE so that the
+    other middlewares count in the `other` phase. Disabled by
+    PROFILING_ENABLED = False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(_connection_created, dispatch_uid='projects.profiling')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = self.start()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = self.start()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def start(self):
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+        return Profile()
+
+    def finish(self, request, response, profile):
+        profile.finish()
+        match = request.resolver_match
+        if match is not None:
+            route_profiles.add(f'{request.method} {match.view_name}', profile)
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = profile.server_timing()
+        return response
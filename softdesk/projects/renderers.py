@@ -0,0 +1,53 @@
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+def streaming_response(request, stream, astream, *args, content_type):
+    """
+    StreamingHttpResponse of `astream(*args)` under ASGI, where a sync
+    iterator would be consumed whole before sending anything, and of
+    `stream(*args)` under WSGI.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return StreamingHttpResponse(astream(*args), content_type=content_type)
+    return StreamingHttpResponse(stream(*args), content_type=content_type)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Selects the NDJSON export with `?format=ndjson`. Exports are streamed by
+    the view, the renderer itself only serializes error responses.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data) + '\n').encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """Selects the CSV export with `?format=csv`, see NDJSONRenderer."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        detail = data.get('detail', data) if isinstance(data, dict) else data
+        return f'detail\n"{detail}"\n'.encode(self.charset)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Server-sent events of a project. The stream is written by the view, the
+    renderer only sends error responses as an `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'event: error\ndata: {json.dumps(data)}\n\n'.encode(self.charset)
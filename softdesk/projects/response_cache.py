@@ -0,0 +1,100 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from projects.metrics import count_cache_lookup
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+
+class ProjectResponseCache:
+    """
+    Cache of serialized API responses scoped to a project. Every key embeds
+    the current version of the project, bumped by the signals on any write
+    to the project, its contributors, issues or comments: invalidating a
+    project is a single incr, stale entries are never read again and expire
+    on their own.
+
+    Only responses that are the same for every contributor of the project are
+    cached, and they are looked up once the permissions of the request have
+    been checked.
+    """
+
+    def __init__(self, alias=RESPONSE_CACHE_ALIAS):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, project_id):
+        return f'project-version:{project_id}'
+
+    def version(self, project_id):
+        key = self.version_key(project_id)
+        version = self.cache.get(key)
+        if version is None:
+            # Start from the clock rather than 1 so that the entries cached
+            # under an evicted version can not be read again
+            self.cache.add(key, time.time_ns(), None)
+            version = self.cache.get(key) or time.time_ns()
+        return version
+
+    async def aversion(self, project_id):
+        key = self.version_key(project_id)
+        version = await self.cache.aget(key)
+        if version is None:
+            await self.cache.aadd(key, time.time_ns(), None)
+            version = await self.cache.aget(key) or time.time_ns()
+        return version
+
+    def response_key(self, project_id, version, url):
+        digest = hashlib.md5(url.encode()).hexdigest()
+        return f'project-response:{project_id}:{version}:{digest}'
+
+    def key(self, project_id, url):
+        return self.response_key(project_id, self.version(project_id), url)
+
+    async def akey(self, project_id, url):
+        return self.response_key(project_id, await self.aversion(project_id), url)
+
+    def get(self, key):
+        return count_cache_lookup(self.alias, self.cache.get(key))
+
+    async def aget(self, key):
+        return count_cache_lookup(self.alias, await self.cache.aget(key))
+
+    def set(self, key, data):
+        self.cache.set(key, data, settings.PROJECT_RESPONSE_CACHE_TIMEOUT)
+
+    async def aset(self, key, data):
+        await self.cache.aset(key, data, settings.PROJECT_RESPONSE_CACHE_TIMEOUT)
+
+    def bump(self, project_ids):
+        """
+        Move the projects to a new version, now and once the current
+        transaction commits so that a concurrent read cannot cache the old
+        state under the new version.
+        """
+        keys = {self.version_key(project_id) for project_id in project_ids if project_id is not None}
+
+        def bump():
+            for key in keys:
+                try:
+                    self.cache.incr(key)
+                except ValueError:
+                    # No version yet, the next read starts a new one
+                    pass
+
+        if keys:
+            bump()
+            transaction.on_commit(bump)
+
+    def clear(self):
+        self.cache.clear()
+
+
+project_response_cache = ProjectResponseCache()
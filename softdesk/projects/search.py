@@ -0,0 +1,214 @@
+"""
+Full-text search over the issues and comments of a project.
+
+The text lives in the `projects_search` SQLite FTS5 table (title, body),
+whose rowid is the id of a SearchDocument row holding the project, issue
+and comment of the document. The index is kept in sync by the Issue and
+Comment signals, by the bulk write paths through `index_issues` /
+`index_comments`, and can be rebuilt with the rebuild_search_index command.
+Deleting a SearchDocument (directly or by cascade) drops its text, with the
+projects_searchdocument_delete trigger (migration 0008).
+"""
+import re
+import uuid
+
+from django.db import connection
+
+from projects.models import Issue, Comment, SearchDocument
+
+SEARCH_TABLE = 'projects_search'
+# Below the SQLite host parameter limit
+CHUNK_SIZE = 500
+# bm25 weights of the title and body columns
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+
+class Unavailable(Exception):
+    """The database backend has no full-text search (SQLite FTS5)."""
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def remove_documents(document_ids):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(document_ids):
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({_placeholders(chunk)})', chunk)
+
+
+def _index_new(ids, document_sql, text_sql):
+    """
+    Index rows created since the last indexing with one INSERT ... SELECT of
+    their documents and one of their text, per chunk of `ids`.
+    """
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            placeholders = _placeholders(chunk)
+            cursor.execute(document_sql.format(placeholders), chunk)
+            cursor.execute(text_sql.format(placeholders), chunk)
+
+
+def _reindex(documents, missing, select_sql):
+    """
+    Replace the text of `documents` (a SearchDocument queryset), after
+    creating the SearchDocument rows `missing`, with the rows of
+    `select_sql` (document id, title, body).
+    """
+    SearchDocument.objects.bulk_create(missing)
+    document_ids = list(documents.values_list('id', flat=True))
+    remove_documents(document_ids)
+    with connection.cursor() as cursor:
+        for chunk in _chunks(document_ids):
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) {select_sql} WHERE d.id IN ({_placeholders(chunk)})',
+                chunk,
+            )
+
+
+def index_issues(issue_ids, created=False):
+    """(Re)index the title and description of the issues, `created` when they were never indexed."""
+    if not is_available() or not issue_ids:
+        return
+    issue_ids = set(issue_ids)
+    if created:
+        _index_new(
+            list(issue_ids),
+            'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+            'SELECT project_id, id, NULL FROM projects_issue WHERE id IN ({})',
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) '
+            'SELECT d.id, i.title, i.description FROM projects_searchdocument d '
+            'INNER JOIN projects_issue i ON i.id = d.issue_id WHERE d.comment_id IS NULL AND d.issue_id IN ({})',
+        )
+        return
+    documents = SearchDocument.objects.filter(issue_id__in=issue_ids, comment__isnull=True)
+    indexed = set(documents.values_list('issue_id', flat=True))
+    missing = [
+        SearchDocument(project_id=project_id, issue_id=issue_id)
+        for issue_id, project_id in Issue.objects.filter(pk__in=issue_ids - indexed).values_list('id', 'project_id')
+    ]
+    _reindex(documents, missing, (
+        'SELECT d.id, i.title, i.description FROM projects_searchdocument d '
+        'INNER JOIN projects_issue i ON i.id = d.issue_id'
+    ))
+
+
+def index_comments(comment_ids, created=False):
+    """(Re)index the description of the comments, `created` when they were never indexed."""
+    if not is_available() or not comment_ids:
+        return
+    comment_ids = {Comment._meta.pk.to_python(comment_id) for comment_id in comment_ids}
+    if created:
+        _index_new(
+            [Comment._meta.pk.get_db_prep_value(comment_id, connection) for comment_id in comment_ids],
+            'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+            'SELECT i.project_id, c.issue_id, c.id FROM projects_comment c '
+            'INNER JOIN projects_issue i ON i.id = c.issue_id WHERE c.id IN ({})',
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) '
+            "SELECT d.id, '', c.description FROM projects_searchdocument d "
+            'INNER JOIN projects_comment c ON c.id = d.comment_id WHERE d.comment_id IN ({})',
+        )
+        return
+    documents = SearchDocument.objects.filter(comment_id__in=comment_ids)
+    indexed = set(documents.values_list('comment_id', flat=True))
+    missing = [
+        SearchDocument(project_id=project_id, issue_id=issue_id, comment_id=comment_id)
+        for comment_id, issue_id, project_id in (
+            Comment.objects.filter(pk__in=comment_ids - indexed).values_list('id', 'issue_id', 'issue__project_id')
+        )
+    ]
+    _reindex(documents, missing, (
+        "SELECT d.id, '', c.description FROM projects_searchdocument d "
+        'INNER JOIN projects_comment c ON c.id = d.comment_id'
+    ))
+
+
+def rebuild():
+    """Drop and rebuild the whole index, return the number of indexed documents."""
+    if not is_available():
+        raise Unavailable('Full-text search requires SQLite FTS5')
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute('DELETE FROM projects_searchdocument')
+        cursor.execute(
+            'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+            'SELECT project_id, id, NULL FROM projects_issue'
+        )
+        cursor.execute(
+            'INSERT INTO projects_searchdocument (project_id, issue_id, comment_id) '
+            'SELECT i.project_id, c.issue_id, c.id FROM projects_comment c '
+            'INNER JOIN projects_issue i ON i.id = c.issue_id'
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) '
+            'SELECT d.id, i.title, i.description FROM projects_searchdocument d '
+            'INNER JOIN projects_issue i ON i.id = d.issue_id WHERE d.comment_id IS NULL'
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) '
+            "SELECT d.id, '', c.description FROM projects_searchdocument d "
+            'INNER JOIN projects_comment c ON c.id = d.comment_id'
+        )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return SearchDocument.objects.count()
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query matching every word, the last one as
+    a prefix. Returns None when the text has no word.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def search(project_id, query, limit=20):
+    """
+    Return the issues and comments of the project matching `query`, best
+    BM25 rank first, as dicts (type, id, issue, title, snippet, rank).
+    Raise Unavailable without full-text search.
+    """
+    if not is_available():
+        raise Unavailable('Full-text search requires SQLite FTS5')
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT d.issue_id, d.comment_id, i.title, "
+            f"snippet({SEARCH_TABLE}, -1, '[', ']', '…', 12), "
+            f"bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank "
+            f"FROM {SEARCH_TABLE} "
+            f"INNER JOIN projects_searchdocument d ON d.id = {SEARCH_TABLE}.rowid "
+            f"INNER JOIN projects_issue i ON i.id = d.issue_id "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND d.project_id = %s "
+            f"ORDER BY rank LIMIT %s",
+            [expression, project_id, limit],
+        )
+        rows = cursor.fetchall()
+    return [
+        {
+            'type': 'comment' if comment_id else 'issue',
+            'id': str(uuid.UUID(comment_id)) if comment_id else issue_id,
+            'issue': issue_id,
+            'title': title,
+            'snippet': snippet,
+            'rank': rank,
+        }
+        for issue_id, comment_id, title, snippet, rank in rows
+    ]
@@ -0,0 +1,184 @@
+"""
+Generator of realistic data for capacity planning.
+
+Unlike the uniform fixture of projects/benchmarks.py, sizes follow heavy
+tailed (Pareto) distributions: most projects have a few contributors and
+issues while some have many, and a few issues carry long comment threads.
+Rows are written with bulk_create, without any per-row signal: their
+effects (author as contributor, comments_count, search index, change log,
+cached memberships and responses) are applied in bulk.
+
+The same `seed` (random seed) always generates the same data.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from projects import changelog, search
+from projects.models import (
+    Project, Contributor, Issue, Comment, TYPE_CHOICES, PRIORITY_CHOICES, STATUS_CHOICES, TAG_CHOICES,
+)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+# Pareto shapes, lower is more skewed
+CONTRIBUTORS_SHAPE = 1.2
+ISSUES_SHAPE = 1.1
+COMMENTS_SHAPE = 1.0
+MAX_ASSIGNEES = 3
+# Spread of the issue updated_time
+HISTORY_DAYS = 365
+# Spread of the comments of a thread, before the updated_time of their issue
+THREAD_DAYS = 30
+
+WORDS = (
+    'api', 'login', 'page', 'crash', 'slow', 'export', 'token', 'mobile', 'search', 'cache', 'button', 'form',
+    'upload', 'timeout', 'layout', 'error', 'update', 'sync', 'filter', 'report', 'android', 'ios', 'backend',
+)
+
+
+def _choice_values(choices):
+    return [value for value, label in choices]
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _spread(rng, total, weights):
+    """Spread `total` items over len(weights) slots, at random proportionally to the weights."""
+    if not weights:
+        return []
+    counts = Counter(rng.choices(range(len(weights)), weights=weights, k=total))
+    return [counts[slot] for slot in range(len(weights))]
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def generate(users, projects, issues, comments, max_contributors=50, seed=0, prefix='seed', password=None, index_search=True):
+    """
+    Bulk-create `users` users, `projects` projects with skewed contributor
+    counts (at most `max_contributors`), `issues` issues with assignees
+    and `comments` comments, and return the row counts per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    counts = Counter()
+    # Hashed once, every generated user shares it (unusable by default)
+    password = make_password(password)
+
+    with transaction.atomic():
+        user_ids = [
+            user.pk for user in User.objects.bulk_create(
+                [User(username=f'{prefix}-user-{index}', password=password) for index in range(users)],
+                batch_size=BATCH_SIZE,
+            )
+        ]
+        counts['user'] = len(user_ids)
+
+        project_objects = Project.objects.bulk_create(
+            [
+                Project(name=_text(rng, 3), description=_text(rng, 12), type=rng.choice(_choice_values(TYPE_CHOICES)),
+                        author_id=rng.choice(user_ids))
+                for index in range(projects)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        counts['project'] = len(project_objects)
+
+        # add_author_as_contributor, then the other contributors
+        members = []
+        for project in project_objects:
+            size = min(max_contributors, len(user_ids), int(rng.paretovariate(CONTRIBUTORS_SHAPE)))
+            others = set(rng.sample(user_ids, size)) - {project.author_id}
+            members += [Contributor(project=project, user_id=user_id) for user_id in [project.author_id, *others]]
+        contributors = Contributor.objects.bulk_create(members, batch_size=BATCH_SIZE)
+        counts['contributor'] = len(contributors)
+        project_contributors = {}
+        for contributor in contributors:
+            project_contributors.setdefault(contributor.project_id, []).append(contributor.pk)
+        changelog.record_objects(project_objects, changelog.CREATED)
+        changelog.record_objects(contributors, changelog.CREATED)
+
+    # Projects with more contributors get more issues
+    issue_counts = _spread(rng, issues, [
+        len(project_contributors[project.pk]) * rng.paretovariate(ISSUES_SHAPE) for project in project_objects
+    ])
+    issue_projects = [project.pk for project, count in zip(project_objects, issue_counts) for _ in range(count)]
+    thread_lengths = _spread(rng, comments, [rng.paretovariate(COMMENTS_SHAPE) for _ in issue_projects])
+    statuses = _choice_values(STATUS_CHOICES)
+    priorities = _choice_values(PRIORITY_CHOICES)
+    tags = _choice_values(TAG_CHOICES)
+    Assignment = Issue.assignees.through
+
+    for batch in _batches(list(zip(issue_projects, thread_lengths))):
+        with transaction.atomic():
+            issue_objects = Issue.objects.bulk_create([
+                Issue(
+                    project_id=project_id,
+                    author_id=rng.choice(project_contributors[project_id]),
+                    title=_text(rng, 5),
+                    description=_text(rng, 20),
+                    status=rng.choice(statuses),
+                    priority=rng.choice(priorities),
+                    tag=rng.choice(tags),
+                    comments_count=thread_length,
+                    updated_time=now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+                )
+                for project_id, thread_length in batch
+            ])
+            assignments = [
+                Assignment(issue_id=issue.pk, contributor_id=contributor_id)
+                for issue in issue_objects
+                for contributor_id in rng.sample(
+                    project_contributors[issue.project_id],
+                    min(rng.randint(0, MAX_ASSIGNEES), len(project_contributors[issue.project_id])),
+                )
+            ]
+            Assignment.objects.bulk_create(assignments, batch_size=BATCH_SIZE)
+            changelog.record_objects(issue_objects, changelog.CREATED)
+            counts['issue'] += len(issue_objects)
+            counts['assignee'] += len(assignments)
+
+            comment_objects = []
+            comment_times = []
+            for issue, (project_id, thread_length) in zip(issue_objects, batch):
+                if not thread_length:
+                    continue
+                # update_issue_updated_time, applied for the whole thread: the
+                # last comment is written at the issue updated_time
+                comment_times += sorted(
+                    issue.updated_time - timedelta(seconds=rng.randrange(THREAD_DAYS * 86400)) for _ in range(thread_length - 1)
+                ) + [issue.updated_time]
+                comment_objects += [
+                    Comment(issue_id=issue.pk, author_id=rng.choice(project_contributors[issue.project_id]), description=_text(rng, 15))
+                    for _ in range(thread_length)
+                ]
+            Comment.objects.bulk_create(comment_objects, batch_size=BATCH_SIZE)
+            # auto_now_add / auto_now override the times in bulk_create, they are written back
+            for comment, created_time in zip(comment_objects, comment_times):
+                comment.created_time = comment.updated_time = created_time
+            Comment.objects.bulk_update(comment_objects, ['created_time', 'updated_time'], batch_size=BATCH_SIZE)
+            project_of_issue = {issue.pk: issue.project_id for issue in issue_objects}
+            changelog.record([
+                changelog.entry(comment, changelog.CREATED, project_of_issue[comment.issue_id]) for comment in comment_objects
+            ])
+            counts['comment'] += len(comment_objects)
+
+    if index_search and search.is_available():
+        search.rebuild()
+    # The signals dropping the cached memberships and responses did not run
+    for alias in caches:
+        caches[alias].clear()
+    return counts
+
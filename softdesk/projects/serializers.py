@@ -1,13 +1,31 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
 
 from projects.models import Project, Contributor, Issue, Comment
+from projects.membership import invalidate_memberships, get_contributor_id
+from projects.response_cache import project_response_cache
+from projects import changelog, search
+from projects.events import publish_issues
 
 User = get_user_model()
 
 
-class ContributorSerializer(serializers.ModelSerializer):
+class SparseFieldsetSerializerMixin:
+    """Drops the fields missing from context['fields'], set by the views for `?fields=`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ContributorSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     project = serializers.StringRelatedField()
 
@@ -15,59 +33,201 @@ class ContributorSerializer(serializers.ModelSerializer):
         model = Contributor
         fields = ['user', 'project']
 
-class IssueListSerializer(serializers.ModelSerializer):
+
+class ContributorSyncSerializer(ContributorSerializer):
+    """Contributor of the sync endpoint, with the ids the clients match rows on."""
+    project = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(ContributorSerializer.Meta):
+        fields = ['id', 'user', 'project']
+
+def write_assignments(assignments, clear=False):
+    """
+    Write the assignee through-table rows of many issues in one bulk insert.
+    `assignments` maps issue ids to Contributor ids, `clear` first drops the
+    current assignees of these issues.
+    """
+    Assignment = Issue.assignees.through
+    if clear and assignments:
+        Assignment.objects.filter(issue_id__in=list(assignments)).delete()
+    Assignment.objects.bulk_create([
+        Assignment(issue_id=issue_id, contributor_id=contributor_id)
+        for issue_id, contributor_ids in assignments.items()
+        for contributor_id in contributor_ids
+    ])
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class IssueBulkListSerializer(serializers.ListSerializer):
+    """
+    Creates or updates many issues of a project in one pass: the assignees of
+    every item are resolved with a single query, the issues are written with
+    bulk_create / bulk_update and their assignees with one bulk insert, in a
+    single transaction.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            user_ids = {
+                _int_or_none(user_id)
+                for item in data if isinstance(item, dict) and isinstance(item.get('assignees'), list)
+                for user_id in item['assignees']
+            }
+            user_ids.discard(None)
+            self.context['assignee_contributors'] = dict(
+                Contributor.objects
+                .filter(project_id=self.child.get_project_id(), user_id__in=user_ids)
+                .values_list('user_id', 'id')
+            )
+            self.validated_instances = []
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            # Bulk update: every item targets one issue of the project, by id
+            issues = {issue.pk: issue for issue in self.instance}
+            issue = issues.get(_int_or_none(data.get('id')) if isinstance(data, dict) else None)
+            if issue is None:
+                raise serializers.ValidationError({'id': ["Issue introuvable dans ce projet."]})
+            if issue in self.validated_instances:
+                raise serializers.ValidationError({'id': ["Issue présente plusieurs fois."]})
+            request = self.context.get('request')
+            if issue.author_id != get_contributor_id(request, issue.project_id):
+                raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Vous n'êtes pas l'auteur de cette issue."]})
+            self.child.instance = issue
+            self.child.initial_data = data
+            validated = super().run_child_validation(data)
+            self.validated_instances.append(issue)
+            return validated
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        assignees = [attrs.pop('assignees', []) for attrs in validated_data]
+        with transaction.atomic():
+            issues = Issue.objects.bulk_create([Issue(**attrs) for attrs in validated_data])
+            write_assignments({issue.pk: contributor_ids for issue, contributor_ids in zip(issues, assignees)})
+            # bulk_create does not send post_save
+            project_response_cache.bump({issue.project_id for issue in issues})
+            search.index_issues([issue.pk for issue in issues], created=True)
+            changelog.record_objects(issues, changelog.CREATED)
+            publish_issues(issues, 'issue.created')
+        return issues
+
+    def update(self, instance, validated_data):
+        # The update_updated_time pre_save signal does not run for bulk_update
+        now = timezone.now()
+        fields = {'updated_time'}
+        assignments = {}
+        for issue, attrs in zip(self.validated_instances, validated_data):
+            contributor_ids = attrs.pop('assignees', None)
+            if contributor_ids is not None:
+                assignments[issue.pk] = contributor_ids
+            for attr, value in attrs.items():
+                setattr(issue, attr, value)
+                fields.add(attr)
+            issue.updated_time = now
+        with transaction.atomic():
+            Issue.objects.bulk_update(self.validated_instances, sorted(fields))
+            write_assignments(assignments, clear=True)
+            project_response_cache.bump({issue.project_id for issue in self.validated_instances})
+            if fields & {'title', 'description'}:
+                search.index_issues([issue.pk for issue in self.validated_instances])
+            changelog.record_objects(self.validated_instances, changelog.UPDATED)
+            publish_issues(self.validated_instances, 'issue.updated')
+        return self.validated_instances
+
+
+class IssueListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.user.username')
     project = serializers.ReadOnlyField(source='project.name')
-    assignees = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), many=True, write_only=True, required=False)
+    # User ids, resolved to the Contributor ids of the project by validate_assignees
+    assignees = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
     
 
     class Meta:
         model = Issue
-        fields = ['id', 'project', 'author', 'title', 'description', 'status', 'priority', 'created_time', 'updated_time', 'assignees']
-        read_only_fields = ['created_time', 'updated_time']
+        fields = ['id', 'project', 'author', 'title', 'description', 'status', 'priority', 'created_time', 'updated_time', 'comments_count', 'assignees']
+        read_only_fields = ['created_time', 'updated_time', 'comments_count']
+        list_serializer_class = IssueBulkListSerializer
 
     
-    
+    def get_project_id(self):
+        if isinstance(self.instance, Issue):
+            return self.instance.project_id
+        view = self.context.get('view')
+        return view.kwargs.get('project_pk') if view else None
+
+    def get_assignee_contributors(self, user_ids):
+        # Already resolved for every item of a bulk request
+        preloaded = self.context.get('assignee_contributors')
+        if preloaded is not None:
+            return {user_id: preloaded[user_id] for user_id in user_ids if user_id in preloaded}
+        return dict(
+            Contributor.objects
+            .filter(project_id=self.get_project_id(), user_id__in=user_ids)
+            .values_list('user_id', 'id')
+        )
+
     def validate_assignees(self, value):
-        project = self.instance.project
-        if isinstance(project, int):
-            project = Project.objects.get(pk=project)
-        for user in value:
-            if not Contributor.objects.filter(project=project, user=user).exists():
-                raise serializers.ValidationError(f"{user.username} is not a contributor of the project.")
-        return value
-    
+        user_ids = set(value)
+        # Maps every assignee to its Contributor id in the project with a single query
+        contributor_ids = self.get_assignee_contributors(user_ids)
+        non_contributors = user_ids - set(contributor_ids)
+        if non_contributors:
+            usernames = dict(User.objects.filter(id__in=non_contributors).values_list('id', 'username'))
+            raise serializers.ValidationError([
+                f"{usernames[user_id]} is not a contributor of the project." if user_id in usernames
+                else f"User {user_id} does not exist."
+                for user_id in sorted(non_contributors)
+            ])
+        return [contributor_ids[user_id] for user_id in user_ids]
+
     def create(self, validated_data):
         assignees = validated_data.pop('assignees', [])
-        issue = super().create(validated_data)
-        for user in assignees:
-            issue.assignees.add(Contributor.objects.get(project=issue.project, user=user))
+        with transaction.atomic():
+            issue = super().create(validated_data)
+            write_assignments({issue.pk: assignees})
         return issue
     
     def update(self, instance, validated_data):
         assignees = validated_data.pop('assignees', None)
-        if assignees is not None:
-            instance.assignees.set([Contributor.objects.get(project=instance.project, user_id=user_id) for user_id in assignees])
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            if assignees is not None:
+                write_assignments({instance.pk: assignees}, clear=True)
+            return super().update(instance, validated_data)
+
+
+class IssueSyncSerializer(IssueListSerializer):
+    """Issue of the sync endpoint, with the id of its project."""
+    project = serializers.PrimaryKeyRelatedField(read_only=True)
 
 
 class IssueDetailSerializer(IssueListSerializer):
-    comments_count = serializers.SerializerMethodField()
 
     class Meta(IssueListSerializer.Meta):
-        fields = IssueListSerializer.Meta.fields + [ 'comments_count']
-        
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+        # comments_count is a column maintained by the Comment signals
+        fields = IssueListSerializer.Meta.fields
+
+class ContributorsField(serializers.ListField):
+    """
+    Usernames of the project contributors. The usernames are resolved to users
+    in a single query by `validate_contributors` instead of one per slug.
+    """
+    child = serializers.CharField()
 
-class ProjectListSerializer(serializers.ModelSerializer):
+    def to_representation(self, value):
+        return [user.username for user in value.all()]
+
+
+class ProjectListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
-    contributors = serializers.SlugRelatedField(
-        queryset=User.objects.all(),
-        many=True,
-        slug_field='username',
-        required=False
-    )
+    contributors = ContributorsField(required=False)
 
     class Meta:
         model = Project
@@ -75,25 +235,31 @@ class ProjectListSerializer(serializers.ModelSerializer):
 
 
     def validate_contributors(self, value):
-        # Remove duplicates from the contributors list
-        unique_contributors = set(value)
+        # Remove duplicates from the contributors list and resolve them in one query
+        usernames = set(value)
+        users = list(User.objects.filter(username__in=usernames).only('id', 'username'))
+        unknown_usernames = usernames - {user.username for user in users}
+        if unknown_usernames:
+            raise serializers.ValidationError(f"Unknown usernames: {', '.join(sorted(unknown_usernames))}")
         
-        # Check if author is in the contributors list and raise a validation error if needed
+        # The author is added as a contributor by the add_author_as_contributor signal
         request = self.context.get('request')
-        if request and request.user in unique_contributors:
-            unique_contributors.remove(request.user)
+        if request:
+            users = [user for user in users if user.pk != request.user.pk]
 
-        return list(unique_contributors)
+        return users
 
     def create(self, validated_data):
-        contributors_usernames = validated_data.pop('contributors', [])
+        contributors = validated_data.pop('contributors', [])
         request = self.context.get('request')
-        project = Project.objects.create(author=request.user, **validated_data)
-        
-        # Add other contributors
-        for username in set(contributors_usernames):
-            user = User.objects.get(username=username)
-            Contributor.objects.get_or_create(user=user, project=project)
+        with transaction.atomic():
+            project = Project.objects.create(author=request.user, **validated_data)
+            
+            # Add other contributors
+            added = Contributor.objects.bulk_create([Contributor(user=user, project=project) for user in contributors])
+            # bulk_create does not send post_save, drop the cached memberships and log the rows here
+            invalidate_memberships(project.pk, [user.pk for user in contributors])
+            changelog.record_objects(added, changelog.CREATED)
         
         return project
 
@@ -105,39 +271,42 @@ class ProjectDetailSerializer(ProjectListSerializer):
         fields = ProjectListSerializer.Meta.fields + ['issues']
 
     def get_issues(self, obj):
-        return obj.issues.values_list('title', flat=True)
+        # Uses the prefetched issues when the viewset query plan provides them
+        return [issue.title for issue in obj.issues.all()]
 
     def update(self, instance, validated_data):
         request = self.context.get('request')
-        if instance.author != request.user:
+        if instance.author_id != request.user.pk:
             raise serializers.ValidationError("Vous n'avez pas les permissions")
         
-        contributors_usernames = validated_data.pop('contributors', [])
+        contributors = validated_data.pop('contributors', [])
         instance.name = validated_data.get('name', instance.name)
         instance.description = validated_data.get('description', instance.description)
         instance.type = validated_data.get('type', instance.type)
-        instance.save()
-
-        if contributors_usernames:
-            new_contributors = set(contributors_usernames)
-            new_contributors.add(request.user.username)
-            current_contributors = set(instance.contributors.values_list('username', flat=True))
-            contributors_to_add = new_contributors - current_contributors
-            contributors_to_remove = current_contributors - new_contributors
-            
-            for username in contributors_to_add:
-                user = User.objects.get(username=username)
-                Contributor.objects.create(user=user, project=instance)
-            
-            for username in contributors_to_remove:
-                user = User.objects.get(username=username)
-                Contributor.objects.filter(user=user, project=instance).delete()
+
+        with transaction.atomic():
+            instance.save()
+
+            if contributors:
+                new_contributors = {user.pk for user in contributors}
+                new_contributors.add(request.user.pk)
+                current_contributors = set(Contributor.objects.filter(project=instance).values_list('user_id', flat=True))
+                contributors_to_add = new_contributors - current_contributors
+                contributors_to_remove = current_contributors - new_contributors
+                
+                added = Contributor.objects.bulk_create(
+                    [Contributor(user_id=user_id, project=instance) for user_id in contributors_to_add]
+                )
+                changelog.record_objects(added, changelog.CREATED)
+                if contributors_to_remove:
+                    Contributor.objects.filter(project=instance, user_id__in=contributors_to_remove).delete()
+                invalidate_memberships(instance.pk, contributors_to_add | contributors_to_remove)
         
         return instance
 
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.user.username')
     issue = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -1,18 +1,217 @@
-from django.db.models.signals import post_save
-from django.db.models.signals import pre_save
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, QuerySet, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Comment, Issue
+from .models import Comment, Issue, Contributor, Project
+from . import changelog, search
+from .events import broker, issue_data, comment_data
+from .membership import invalidate_memberships
+from .metrics import timed_handler
+from .response_cache import project_response_cache
 
 
 @receiver(pre_save, sender=Issue)
 def update_updated_time(sender, instance, **kwargs):
     instance.updated_time = timezone.now()
 
+def touch_issue(issue_id, **updates):
+    """
+    Set the issue updated_time, along with any other `updates`, with a single
+    UPDATE, without loading the row nor sending its save signals. With
+    ISSUE_TOUCH_COALESCE_SECONDS set, updated_time is written at most once
+    per window while the other updates always apply.
+    """
+    window = settings.ISSUE_TOUCH_COALESCE_SECONDS
+    if not window or cache.add(f'issue-touch:{issue_id}', True, window):
+        updates['updated_time'] = timezone.now()
+    if updates:
+        Issue.objects.filter(pk=issue_id).update(**updates)
+
+
+@receiver(post_save, sender=Comment)
+@timed_handler
+def update_issue_updated_time(sender, instance, created, **kwargs):
+    """Mise à jour auto du updated_time et du comments_count des issue quand un comment est posté"""
+    if created:
+        touch_issue(instance.issue_id, comments_count=F('comments_count') + 1)
+        log_issue_update(instance)
+
+
+class CommentDeletions:
+    """Comments removed by one delete() call, counted per issue."""
+
+    def __init__(self):
+        self.issues = Counter()
+        self.remaining = 0
+
+
+def deleted_with_their_issue(origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Project, Issue)
+
+
+@receiver(pre_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Every pre_delete of a delete() is sent before its post_delete signals:
+    # the comments are counted on the origin, the last post_delete applies them
+    if origin is None or deleted_with_their_issue(origin):
+        return
+    deletions = origin.__dict__.setdefault('_comment_deletions', CommentDeletions())
+    deletions.issues[instance.issue_id] += 1
+    deletions.remaining += 1
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_issue_comments_count(sender, instance, origin=None, **kwargs):
+    deletions = getattr(origin, '_comment_deletions', None)
+    if deletions is None:
+        return
+    deletions.remaining -= 1
+    if deletions.remaining:
+        return
+    del origin._comment_deletions
+    # A single UPDATE for all the issues of the deleted comments
+    counts = deletions.issues
+    removed = Case(*[When(pk=issue_id, then=Value(count)) for issue_id, count in counts.items()], output_field=IntegerField())
+    Issue.objects.filter(pk__in=counts).update(comments_count=Greatest(F('comments_count') - removed, 0))
+    # The issues were written with update(), which sends no signal
+    changelog.record_issues(list(counts))
+
+
+def log_issue_update(comment):
+    # The issue was written with update(), which sends no signal
+    changelog.issue_entry(comment.issue_id, comment_project_id(comment)).save()
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def invalidate_membership_cache(sender, instance, **kwargs):
+    invalidate_memberships(instance.project_id, [instance.user_id])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def bump_project_version(sender, instance, **kwargs):
+    project_response_cache.bump([instance.pk])
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def bump_parent_project_version(sender, instance, **kwargs):
+    project_response_cache.bump([instance.project_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def bump_user_projects_version(sender, instance, created, update_fields=None, **kwargs):
+    # The cached responses show the username of the contributors
+    if created or (update_fields and 'username' not in update_fields):
+        return
+    project_response_cache.bump(Contributor.objects.filter(user=instance).values_list('project_id', flat=True))
+
+
+def comment_project_id(comment):
+    if Comment.issue.is_cached(comment):
+        return comment.issue.project_id
+    return Issue.objects.filter(pk=comment.issue_id).values_list('project_id', flat=True).first()
+
+
 @receiver(post_save, sender=Comment)
-def update_issue_updated_time(sender, instance, **kwargs):
-    """Mise à jour auto du updated_time des issue quand un comment est posté"""
-    
-    issue = instance.issue
-    issue.updated_time = timezone.now()
-    issue.save()
\ No newline at end of file
+@receiver(post_delete, sender=Comment)
+def bump_comment_project_version(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Project, Issue)):
+        # Deleted along with its issue or project, which bump the version
+        return
+    project_response_cache.bump([comment_project_id(instance)])
+
+
+@receiver(post_save, sender=Issue)
+def index_issue(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not {'title', 'description'} & set(update_fields):
+        return
+    search.index_issues([instance.pk], created=created)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and 'description' not in update_fields:
+        return
+    search.index_comments([instance.pk], created=created)
+
+
+@receiver(post_save, sender=Project)
+def publish_project_event(sender, instance, created, **kwargs):
+    if not created:
+        broker.publish_on_commit(instance.pk, 'project.updated', {'id': instance.pk})
+
+
+@receiver(post_delete, sender=Project)
+def publish_project_deleted(sender, instance, **kwargs):
+    project_id = instance.pk
+    broker.publish_on_commit(project_id, 'project.deleted', {'id': project_id})
+    transaction.on_commit(lambda: broker.close_project(project_id))
+
+
+@receiver(post_save, sender=Issue)
+def publish_issue_event(sender, instance, created, **kwargs):
+    broker.publish_on_commit(instance.project_id, 'issue.created' if created else 'issue.updated', issue_data(instance))
+
+
+@receiver(post_delete, sender=Issue)
+def publish_issue_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Project):
+        # Covered by project.deleted
+        return
+    broker.publish_on_commit(instance.project_id, 'issue.deleted', {'id': instance.pk, 'project': instance.project_id})
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_event(sender, instance, created, **kwargs):
+    project_id = comment_project_id(instance)
+    broker.publish_on_commit(project_id, 'comment.created' if created else 'comment.updated', comment_data(instance, project_id))
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Project, Issue)):
+        return
+    project_id = comment_project_id(instance)
+    broker.publish_on_commit(project_id, 'comment.deleted', {'id': str(instance.pk), 'issue': instance.issue_id, 'project': project_id})
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Contributor)
+@receiver(post_save, sender=Issue)
+def log_change(sender, instance, created, **kwargs):
+    changelog.entry(instance, changelog.CREATED if created else changelog.UPDATED).save()
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Contributor)
+@receiver(post_delete, sender=Issue)
+def log_deletion(sender, instance, origin=None, **kwargs):
+    # Contributors deleted with their project are still logged: they tell
+    # their users that they left it
+    if sender is Issue and isinstance(origin, Project):
+        return
+    changelog.entry(instance, changelog.DELETED).save()
+
+
+@receiver(post_save, sender=Comment)
+def log_comment_change(sender, instance, created, **kwargs):
+    changelog.entry(instance, changelog.CREATED if created else changelog.UPDATED, comment_project_id(instance)).save()
+
+
+@receiver(post_delete, sender=Comment)
+def log_comment_deletion(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Project, Issue)):
+        return
+    changelog.entry(instance, changelog.DELETED, comment_project_id(instance)).save()
@@ -1,17 +1,47 @@
+import base64
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 import unittest
+from unittest import mock
+from asgiref.sync import sync_to_async
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from urllib.parse import urlencode
 
-from projects.models import Project, Contributor, Issue, Comment
+from projects.models import Project, Contributor, Issue, Comment, ChangeLog
+from projects.response_cache import project_response_cache
+from projects.events import broker
+from projects.benchmarks import seed, measure_routes, load_budgets, check_budgets, find_full_scans
+from projects.seeding import generate
+from projects.load import DEFAULT_MIX, WRITE_ROUTES, parse_mix, load_targets, plan_mix, report
+from projects.profiling import route_profiles
+from prometheus_client import REGISTRY
 
 User = get_user_model()
 
 class ProjectTest(APITestCase):
 
     def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
         self.user = User.objects.create_user(username='testuser', password='password')
         self.other_user = User.objects.create_user(username='otheruser', password='password')
         self.another_user = User.objects.create_user(username='anotheruser', password='password')
@@ -132,6 +162,103 @@ class ProjectTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertTrue(Project.objects.filter(id=project.id).exists())
 
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_projects_query_count_is_constant(self):
+        url = reverse('project-list')
+        self.count_list_queries(url)
+        queries_for_one_project = self.count_list_queries(url)
+        for index in range(4):
+            project = Project.objects.create(name=f'Project {index}', description='desc', type='ios', author=self.other_user)
+            Contributor.objects.create(user=self.another_user, project=project)
+        self.assertEqual(self.count_list_queries(url), queries_for_one_project)
+
+    def count_create_queries(self, contributors_count):
+        usernames = [f'bulk-{contributors_count}-{index}' for index in range(contributors_count)]
+        User.objects.bulk_create([User(username=username, password='!') for username in usernames])
+        data = {'name': 'Bulk Project', 'description': 'desc', 'type': 'ios', 'contributors': usernames}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('project-list'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Contributor.objects.filter(project_id=response.data['id']).count(), contributors_count + 1)
+        return len(context.captured_queries)
+
+    def test_create_project_contributors_query_count_is_constant(self):
+        self.count_create_queries(1)
+        self.assertEqual(self.count_create_queries(2), self.count_create_queries(50))
+
+    def test_create_project_lists_every_unknown_contributor(self):
+        data = {'name': 'Unknown', 'description': 'desc', 'type': 'ios', 'contributors': ['otheruser', 'ghost1', 'ghost2']}
+        response = self.client.post(reverse('project-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ghost1', str(response.data['contributors']))
+        self.assertIn('ghost2', str(response.data['contributors']))
+
+    def test_membership_is_cached_between_requests(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('WHERE ("projects_contributor"."project_id"' in query['sql'] for query in context.captured_queries))
+
+    def test_removed_contributor_loses_access(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id])
+        other_token = 'Bearer ' + str(RefreshToken.for_user(self.other_user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=other_token)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+        response = self.client.patch(url, {'contributors': ['anotheruser']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=other_token)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_project_detail_is_cached_until_an_issue_changes(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertFalse(any('FROM "projects_issue"' in query['sql'] and 'title' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(response.data['issues'], [])
+        Issue.objects.create(project=project, author=project.contributor_set.get(user=self.user), title='New issue',
+                             description='', status='to-do', priority='low', tag='bug')
+        self.assertEqual(self.client.get(url).data['issues'], ['New issue'])
+
+    def test_cached_project_detail_requires_contributor(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.another_user).access_token))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_project_detail_sparse_fieldset_skips_prefetches(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id]) + '?fields=id,name'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.data, {'id': project.id, 'name': 'Test Project'})
+        self.assertFalse(any('FROM "projects_issue"' in query['sql'] and 'title' in query['sql'] for query in context.captured_queries))
+        self.assertFalse(any('INNER JOIN "projects_contributor"' in query['sql'] for query in context.captured_queries))
+
+    def test_project_detail_not_modified(self):
+        project = Project.objects.get(name='Test Project')
+        url = reverse('project-detail', args=[project.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        Contributor.objects.filter(project=project, user=self.other_user).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
     @classmethod
     def tearDownClass(cls):
         super(ProjectTest, cls).tearDownClass()
@@ -140,6 +267,8 @@ class ProjectTest(APITestCase):
 class IssueTest(APITestCase):
 
     def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='password')
         self.other_user = User.objects.create_user(username='otheruser', password='password')
@@ -264,6 +393,310 @@ class IssueTest(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, 403)
 
+    def test_create_issue_with_assignees(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        data = {
+            'title': 'Assigned Issue',
+            'description': 'This is a test issue',
+            'status': 'to-do',
+            'priority': 'high',
+            'tag': 'bug',
+            'assignees': [self.user.id, self.other_user.id],
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        issue = Issue.objects.get(title='Assigned Issue')
+        self.assertEqual(set(issue.assignees.values_list('user_id', flat=True)), {self.user.id, self.other_user.id})
+
+    def test_update_assignees_lists_every_non_contributor(self):
+        issue = self.create_issue()
+        outsider = User.objects.create(username='outsider', password='!')
+        url = reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': issue.id})
+        data = {'assignees': [self.other_user.id, self.not_contributor_user.id, outsider.id]}
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['assignees']), 2)
+        self.assertIn('not_contributor', str(response.data['assignees']))
+        self.assertIn('outsider', str(response.data['assignees']))
+        self.assertEqual(issue.assignees.count(), 0)
+
+    def issue_data(self, title, **extra):
+        return {'title': title, 'description': 'Bulk issue', 'status': 'to-do', 'priority': 'low', 'tag': 'bug', **extra}
+
+    def test_bulk_create_issues(self):
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        data = [self.issue_data(f'Bulk {index}', assignees=[self.other_user.id]) for index in range(3)]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([issue['title'] for issue in response.data], ['Bulk 0', 'Bulk 1', 'Bulk 2'])
+        issues = Issue.objects.filter(project=self.project)
+        self.assertEqual(issues.count(), 3)
+        self.assertTrue(all(issue.author == self.project_author for issue in issues))
+        self.assertEqual(Issue.assignees.through.objects.filter(contributor=self.other_contributor).count(), 3)
+
+    def test_bulk_create_query_count_is_constant(self):
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        self.client.post(url, [self.issue_data('Warm up')], format='json')
+        counts = []
+        for size in (2, 20):
+            data = [self.issue_data(f'Bulk {index}', assignees=[self.user.id, self.other_user.id]) for index in range(size)]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(url, data, format='json')
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_reports_errors_per_item(self):
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        data = [self.issue_data('Valid'), self.issue_data('Invalid', assignees=[self.not_contributor_user.id])]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertIn('assignees', response.data['errors'][0]['errors'])
+        self.assertFalse(Issue.objects.exists())
+
+    def test_bulk_update_issues(self):
+        issues = [self.create_issue() for index in range(2)]
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        data = [{'id': issue.id, 'status': 'finished', 'assignees': [self.other_user.id]} for issue in issues]
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        for issue in issues:
+            old_updated_time = issue.updated_time
+            issue.refresh_from_db()
+            self.assertEqual(issue.status, 'finished')
+            self.assertEqual(issue.title, 'Test Issue')
+            self.assertGreater(issue.updated_time, old_updated_time)
+            self.assertEqual(list(issue.assignees.all()), [self.other_contributor])
+
+    def test_bulk_update_by_no_author(self):
+        issue = self.create_issue()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.other_user).access_token))
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        response = self.client.patch(url, [{'id': issue.id, 'status': 'finished'}, {'id': 0, 'status': 'finished'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+        issue.refresh_from_db()
+        self.assertEqual(issue.status, 'to-do')
+
+    def export(self, export_format):
+        url = reverse('project-export', args=[self.project.id]) + f'?format={export_format}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_issues_as_ndjson_and_csv(self):
+        issues = [self.create_issue() for index in range(3)]
+        issues[0].assignees.add(self.other_contributor)
+        Comment.objects.create(issue=issues[0], author=self.other_contributor, description='Exported comment')
+
+        records = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual([record['id'] for record in records], [issue.id for issue in issues])
+        self.assertEqual(records[0]['assignees'], ['otheruser'])
+        self.assertEqual([comment['description'] for comment in records[0]['comments']], ['Exported comment'])
+
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual([row['record_type'] for row in rows], ['issue', 'comment', 'issue', 'issue'])
+        self.assertEqual(rows[1]['author'], 'otheruser')
+
+    async def test_asgi_export(self):
+        issue = await sync_to_async(self.create_issue)()
+        await Comment.objects.acreate(issue=issue, author=self.other_contributor, description='Exported comment')
+        url = reverse('project-export', args=[self.project.id])
+        for export_format, expected in (('ndjson', 1), ('csv', 3)):
+            response = await self.async_client.get(url, {'format': export_format}, headers={'Authorization': 'Bearer ' + self.token})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+            self.assertEqual(len(lines), expected)
+        self.assertEqual(lines[2].split(',')[4], 'Exported comment')
+
+    def test_export_by_no_contributor(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.not_contributor_user).access_token))
+        response = self.client.get(reverse('project-export', args=[self.project.id]) + '?format=csv')
+        self.assertEqual(response.status_code, 403)
+
+    def test_walk_issues_with_cursor_pagination(self):
+        issues = [self.create_issue() for index in range(12)]
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?pagination=cursor'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [issue['id'] for issue in response.data['results']]
+            url = response.data['next']
+        # Most recently updated first
+        self.assertEqual(seen, [issue.id for issue in reversed(issues)])
+
+    def test_list_issues_most_recently_updated_first(self):
+        issues = [self.create_issue() for index in range(3)]
+        issues[0].title = 'Touched'
+        issues[0].save()
+        response = self.client.get(reverse('issue-list', kwargs={'project_pk': self.project.id}))
+        self.assertEqual([issue['id'] for issue in response.data['results']], [issues[0].id, issues[2].id, issues[1].id])
+
+    def test_list_issues_query_count_is_constant(self):
+        self.create_issue()
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.client.get(url)
+        # Measures the uncached page
+        project_response_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        queries_for_one_issue = len(context.captured_queries)
+        for index in range(4):
+            self.create_issue()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(context.captured_queries), queries_for_one_issue)
+
+    def test_issue_list_cache_follows_comments(self):
+        issue = self.create_issue()
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.assertEqual(self.client.get(url).data['results'][0]['comments_count'], 0)
+        comments_url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': issue.id})
+        self.client.post(comments_url, {'description': 'First comment'}, format='json')
+        self.assertEqual(self.client.get(url).data['results'][0]['comments_count'], 1)
+
+    def test_bulk_update_invalidates_issue_list_cache(self):
+        issue = self.create_issue()
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.client.get(url)
+        response = self.client.patch(reverse('issue-bulk', kwargs={'project_pk': self.project.id}),
+                                     [{'id': issue.id, 'title': 'Bulk title'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data['results'][0]['title'], 'Bulk title')
+
+    def test_list_issues_sparse_fieldset(self):
+        self.create_issue()
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?fields=id,title,status'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'status'})
+        page_query = [query['sql'] for query in context.captured_queries if '"projects_issue"."title"' in query['sql']][0]
+        self.assertNotIn('description', page_query)
+        self.assertNotIn('JOIN', page_query)
+
+    def test_walk_issues_sparse_fieldset_with_cursor_pagination(self):
+        issues = [self.create_issue() for index in range(7)]
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?pagination=cursor&fields=title'
+        first_page = self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            second_page = self.client.get(first_page.data['next'])
+        self.assertEqual(second_page.data['results'], [{'title': 'Test Issue'}] * 2)
+        self.assertEqual(len([query for query in context.captured_queries if 'FROM "projects_issue"' in query['sql']]), 2)
+
+    def test_list_issues_unknown_field(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?fields=title,assignees,secret'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assignees, secret', str(response.data['fields']))
+
+    def test_filter_issues(self):
+        bug = self.create_issue()
+        Issue.objects.filter(pk=bug.pk).update(tag='bug', status='in-progress')
+        task = self.create_issue()
+        task.assignees.add(self.other_contributor)
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        ids = lambda query: [issue['id'] for issue in self.client.get(f'{url}?{query}').data['results']]
+        self.assertEqual(ids('tag=bug'), [bug.id])
+        self.assertEqual(ids('status=to-do&status=in-progress&ordering=-updated_time'), [task.id, bug.id])
+        self.assertEqual(ids(f'assignee={self.other_user.id}'), [task.id])
+        self.assertEqual(ids(f'author={self.other_user.id}'), [])
+        self.assertEqual(ids('updated_time_after=2000-01-01T00:00:00Z&ordering=created_time'), [bug.id, task.id])
+        self.assertEqual(ids('updated_time_before=2000-01-01T00:00:00Z'), [])
+
+    def test_filter_issues_rejects_invalid_values(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.assertEqual(self.client.get(url + '?status=done').status_code, 400)
+        # Orderings outside ordering_fields are ignored
+        self.create_issue()
+        self.assertEqual(self.client.get(url + '?ordering=description').status_code, 200)
+
+    def test_walk_issues_with_cursor_pagination_and_ordering(self):
+        issues = [self.create_issue() for index in range(7)]
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?pagination=cursor&ordering=-updated_time'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen += [issue['id'] for issue in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [issue.id for issue in reversed(issues)])
+
+    def test_walk_issues_with_tied_updated_time(self):
+        issues = [self.create_issue() for index in range(7)]
+        # Like a bulk update, every issue gets the same updated_time
+        Issue.objects.filter(project=self.project).update(updated_time=timezone.now())
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id}) + '?pagination=cursor&page_size=2'
+        seen = []
+        with CaptureQueriesContext(connection) as context:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                seen += [issue['id'] for issue in response.data['results']]
+                previous, url = response.data['previous'], response.data['next']
+        self.assertEqual(seen, [issue.id for issue in reversed(issues)])
+        # Each page is a keyset comparison, never an OFFSET through the tie
+        self.assertFalse(any('OFFSET' in query['sql'] for query in context.captured_queries))
+
+        seen = []
+        url = previous
+        while url:
+            response = self.client.get(url)
+            seen = [issue['id'] for issue in response.data['results']] + seen
+            url = response.data['previous']
+        self.assertEqual(seen, [issue.id for issue in reversed(issues)][:6])
+
+    def test_invalid_cursor(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        for position in ('nope', '["x", "1"]', '["1"]'):
+            cursor = base64.b64encode(urlencode({'p': position}).encode()).decode()
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+    def test_list_issues_not_modified(self):
+        issue = self.create_issue()
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"projects_issue"."title"' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(self.client.get(url + '?limit=1', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        issue.title = 'Renamed'
+        issue.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_issues_modified_by_project_and_author_renames(self):
+        issue = self.create_issue()
+        list_url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        detail_url = reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': issue.id})
+        for url in (list_url, detail_url):
+            etag = self.client.get(url)['ETag']
+            self.project.name = f'Renamed {url}'
+            self.project.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['results'][0]['project'] if url == list_url else response.data['project'], self.project.name)
+
+            etag = response['ETag']
+            self.user.username = f'renamed{len(url)}'
+            self.user.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['results'][0]['author'] if url == list_url else response.data['author'], self.user.username)
+
+    def test_get_issue_not_modified_since(self):
+        issue = self.create_issue()
+        url = reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': issue.id})
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
     @classmethod
     def tearDownClass(cls):
         super(IssueTest, cls).tearDownClass()
@@ -272,6 +705,8 @@ class IssueTest(APITestCase):
 class CommentTest(APITestCase):
 
     def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='password')
         self.other_user = User.objects.create_user(username='otheruser', password='password')
@@ -377,12 +812,866 @@ class CommentTest(APITestCase):
         self.assertEqual(Comment.objects.count(), 1)
 
 
+    def test_create_comment_touches_issue_in_one_update(self):
+        old_updated_time = Issue.objects.filter(pk=self.issue.pk).values_list('updated_time', flat=True).get()
+        url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'description': 'Touch'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        issue_writes = [query for query in context.captured_queries if query['sql'].startswith('UPDATE "projects_issue"')]
+        self.assertEqual(len(issue_writes), 1)
+        self.issue.refresh_from_db()
+        self.assertGreater(self.issue.updated_time, old_updated_time)
+
+    def test_edit_comment_does_not_touch_issue(self):
+        comment = self.create_comment()
+        self.issue.refresh_from_db()
+        comment.description = 'Edited'
+        comment.save()
+        updated_time = Issue.objects.filter(pk=self.issue.pk).values_list('updated_time', flat=True).get()
+        self.assertEqual(updated_time, self.issue.updated_time)
+
+    @override_settings(ISSUE_TOUCH_COALESCE_SECONDS=60)
+    def test_comment_burst_touches_issue_once(self):
+        self.create_comment()
+        self.issue.refresh_from_db()
+        self.create_comment()
+        updated_time = Issue.objects.filter(pk=self.issue.pk).values_list('updated_time', flat=True).get()
+        self.assertEqual(updated_time, self.issue.updated_time)
+
+    def test_comments_count_follows_comments(self):
+        comment = self.create_comment()
+        self.create_comment()
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.comments_count, 2)
+        url = reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id, 'pk': comment.id})
+        self.client.delete(url)
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['comments_count'], 1)
+
+    def test_queryset_delete_updates_comments_count_once(self):
+        other_issue = Issue.objects.create(project=self.project, author=self.issue.author, title='Other', description='',
+                                           status='to-do', priority='low', tag='bug')
+        for issue in (self.issue, self.issue, self.issue, other_issue, other_issue):
+            Comment.objects.create(issue=issue, author=self.issue.author, description='Deleted')
+        kept = self.create_comment()
+        with CaptureQueriesContext(connection) as context:
+            Comment.objects.exclude(pk=kept.pk).delete()
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE "projects_issue"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Issue.objects.get(pk=self.issue.pk).comments_count, 1)
+        self.assertEqual(Issue.objects.get(pk=other_issue.pk).comments_count, 0)
+
+    def test_cascade_delete_skips_comments_count(self):
+        for _ in range(3):
+            self.create_comment()
+        with CaptureQueriesContext(connection) as context:
+            self.project.delete()
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('UPDATE "projects_issue"')])
+
+    def test_reconcile_comments_count(self):
+        self.create_comment()
+        Issue.objects.filter(pk=self.issue.pk).update(comments_count=7)
+        call_command('reconcile_comments_count', stdout=io.StringIO())
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.comments_count, 1)
+
+    def test_update_comment_resolves_membership_once(self):
+        comment = self.create_comment()
+        url = reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id, 'pk': comment.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url, {'description': 'Updated comment'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        membership_queries = [query for query in context.captured_queries
+                              if query['sql'].startswith('SELECT') and 'FROM "projects_contributor"' in query['sql']]
+        self.assertEqual(len(membership_queries), 1)
+
+    def test_filter_comments_by_author(self):
+        self.create_comment()
+        other_contributor = Contributor.objects.get(user=self.other_user, project=self.project)
+        other_comment = Comment.objects.create(issue=self.issue, author=other_contributor, description='Other comment')
+        url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id})
+        response = self.client.get(f'{url}?author={self.other_user.id}&created_time_after=2000-01-01T00:00:00Z')
+        self.assertEqual([comment['id'] for comment in response.data['results']], [str(other_comment.id)])
+
+    def test_list_comments_not_modified(self):
+        comment = self.create_comment()
+        url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comment.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_comments_modified_by_author_rename(self):
+        comment = self.create_comment()
+        url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id})
+        etag = self.client.get(url)['ETag']
+        comment.author.user.username = 'renamed'
+        comment.author.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['author'], 'renamed')
+
+    def test_not_modified_requires_contributor(self):
+        url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue.id})
+        etag = self.client.get(url)['ETag']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.no_contributor).access_token))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
     @classmethod
     def tearDownClass(cls):
         super(CommentTest, cls).tearDownClass()
         print('Test Comment ok')
 
-    
-        
 
-    
\ No newline at end of file
+class ImportTrackerTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        self.alice = User.objects.create(username='alice', password='!')
+        self.bob = User.objects.create(username='bob', password='!')
+
+    def import_records(self, records, batch_size=2):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/tracker.ndjson'
+        with open(path, 'w') as ndjson_file:
+            ndjson_file.write('\n'.join(json.dumps(record) for record in records))
+        call_command('import_tracker', path, batch_size=batch_size, stdout=io.StringIO())
+
+    def test_import_tracker(self):
+        self.import_records([
+            {'model': 'project', 'id': 7, 'name': 'Imported', 'description': 'desc', 'type': 'ios', 'author': 'alice',
+             'created_time': '2020-01-01T10:00:00Z'},
+            {'model': 'contributor', 'project': 7, 'user': 'bob'},
+            {'model': 'issue', 'id': 70, 'project': 7, 'author': 'alice', 'title': 'Imported issue', 'description': 'desc',
+             'status': 'to-do', 'priority': 'low', 'tag': 'bug', 'assignees': ['bob'], 'updated_time': '2020-01-02T10:00:00Z'},
+            {'model': 'comment', 'issue': 70, 'author': 'bob', 'description': 'First', 'created_time': '2020-01-03T10:00:00Z'},
+            {'model': 'comment', 'issue': 70, 'author': 'alice', 'description': 'Second', 'created_time': '2020-01-04T10:00:00Z'},
+        ])
+        project = Project.objects.get(pk=7)
+        self.assertEqual(project.created_time.year, 2020)
+        self.assertEqual(set(project.contributors.values_list('username', flat=True)), {'alice', 'bob'})
+        issue = Issue.objects.get(pk=70)
+        self.assertEqual(issue.author.user, self.alice)
+        self.assertEqual([contributor.user for contributor in issue.assignees.all()], [self.bob])
+        self.assertEqual(issue.comments_count, 2)
+        self.assertEqual(issue.updated_time.isoformat(), '2020-01-04T10:00:00+00:00')
+
+    def test_import_logs_only_new_memberships(self):
+        self.import_records([
+            {'model': 'project', 'id': 7, 'name': 'Imported', 'type': 'ios', 'author': 'alice'},
+            {'model': 'contributor', 'project': 7, 'user': 'bob'},
+            {'model': 'issue', 'id': 70, 'project': 7, 'author': 'alice', 'title': 'T', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'},
+        ])
+        self.assertEqual(ChangeLog.objects.filter(model='contributor', action='created').count(), 2)
+        # Comments of existing contributors, in batches of their own
+        self.import_records([
+            {'model': 'comment', 'issue': 70, 'author': 'bob', 'description': 'First'},
+            {'model': 'comment', 'issue': 70, 'author': 'alice', 'description': 'Second'},
+        ], batch_size=1)
+        self.assertEqual(ChangeLog.objects.filter(model='contributor', action='created').count(), 2)
+        self.assertEqual(Contributor.objects.filter(project_id=7).count(), 2)
+
+    def test_import_unknown_user(self):
+        with self.assertRaisesMessage(CommandError, "line 1: unknown user 'ghost'"):
+            self.import_records([{'model': 'project', 'id': 8, 'name': 'P', 'type': 'ios', 'author': 'ghost'}])
+        self.assertFalse(Project.objects.exists())
+
+
+    def test_import_invalid_choices(self):
+        with self.assertRaisesMessage(CommandError, "line 1: invalid type 'bogus-type'"):
+            self.import_records([{'model': 'project', 'id': 8, 'name': 'P', 'type': 'bogus-type', 'author': 'alice'}])
+        with self.assertRaisesMessage(CommandError, "line 2: invalid status 'nope'"):
+            self.import_records([
+                {'model': 'project', 'id': 8, 'name': 'P', 'type': 'ios', 'author': 'alice'},
+                {'model': 'issue', 'id': 80, 'project': 8, 'author': 'alice', 'title': 'T', 'status': 'nope', 'priority': 'low', 'tag': 'bug'},
+            ])
+        self.assertFalse(Project.objects.exists())
+
+    def test_import_unknown_project(self):
+        with self.assertRaisesMessage(CommandError, "line 1: unknown project 9"):
+            self.import_records([
+                {'model': 'issue', 'id': 90, 'project': 9, 'author': 'alice', 'title': 'T', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'},
+            ])
+        with self.assertRaisesMessage(CommandError, "line 1: unknown project 9"):
+            self.import_records([{'model': 'contributor', 'project': 9, 'user': 'bob'}])
+
+    def test_import_malformed_ids(self):
+        project = {'model': 'project', 'id': 7, 'name': 'P', 'type': 'ios', 'author': 'alice'}
+        issue = {'model': 'issue', 'id': 70, 'project': 7, 'author': 'alice', 'title': 'T', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'}
+        cases = [
+            ([{**project, 'id': 'seven'}], "line 1: invalid id 'seven'"),
+            ([project, {**issue, 'project': 'seven'}], "line 2: invalid project 'seven'"),
+            ([project, issue, {'model': 'comment', 'issue': 'abc', 'author': 'alice', 'description': 'C'}], "line 3: invalid issue 'abc'"),
+            ([project, issue, {'model': 'comment', 'id': 'not-a-uuid', 'issue': 70, 'author': 'alice', 'description': 'C'}],
+             "line 3: invalid id 'not-a-uuid'"),
+            ([project, {**issue, 'assignees': 'bob'}], "line 2: invalid assignees 'bob'"),
+        ]
+        for records, message in cases:
+            with self.subTest(message), self.assertRaisesMessage(CommandError, message):
+                self.import_records(records, batch_size=10)
+        self.assertFalse(Project.objects.exists())
+
+    def test_import_twice_rolls_back_the_batch(self):
+        records = [
+            {'model': 'project', 'id': 7, 'name': 'Imported', 'type': 'ios', 'author': 'alice'},
+            {'model': 'project', 'id': 8, 'name': 'Other', 'type': 'ios', 'author': 'alice'},
+            {'model': 'project', 'id': 9, 'name': 'Last', 'type': 'ios', 'author': 'alice'},
+        ]
+        self.import_records(records[:1])
+        with self.assertRaisesMessage(CommandError, 'batch 1 (lines 1-2) rolled back'):
+            self.import_records(records)
+        self.assertEqual(list(Project.objects.values_list('id', flat=True)), [7])
+
+class SearchTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.outsider = User.objects.create_user(username='outsider', password='password')
+        self.project = Project.objects.create(name='Search', description='', type='back-end', author=self.user)
+        self.other_project = Project.objects.create(name='Other', description='', type='back-end', author=self.outsider)
+        self.author = Contributor.objects.get(user=self.user, project=self.project)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.user).access_token))
+        self.url = reverse('project-search', args=[self.project.id])
+
+    def create_issue(self, title, description='', project=None):
+        project = project or self.project
+        return Issue.objects.create(project=project, author=project.contributor_set.get(user=project.author),
+                                    title=title, description=description, status='to-do', priority='low', tag='bug')
+
+    def search(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['id']) for result in response.data['results']]
+
+    def test_search_unavailable(self):
+        with mock.patch('projects.search.is_available', return_value=False):
+            response = self.client.get(self.url, {'q': 'login'})
+            self.assertEqual(response.status_code, 503)
+            with self.assertRaisesMessage(CommandError, 'Full-text search requires SQLite FTS5'):
+                call_command('rebuild_search_index', stdout=io.StringIO())
+
+    def test_search_ranks_title_matches_first(self):
+        in_description = self.create_issue('Crash', 'The login page fails')
+        in_title = self.create_issue('Login button', 'Nothing happens')
+        comment = Comment.objects.create(issue=in_description, author=self.author, description='Login works again')
+        self.create_issue('Login elsewhere', project=self.other_project)
+        results = self.search('login')
+        self.assertEqual(results[0], ('issue', in_title.id))
+        self.assertCountEqual(results[1:], [('issue', in_description.id), ('comment', str(comment.id))])
+        self.assertEqual(self.search('logi'), self.search('login'))
+
+    def test_search_follows_updates_and_deletions(self):
+        issue = self.create_issue('Typo in footer')
+        comment = Comment.objects.create(issue=issue, author=self.author, description='Footer fixed')
+        issue.title = 'Typo in header'
+        issue.save()
+        self.assertEqual(self.search('header'), [('issue', issue.id)])
+        comment.delete()
+        self.assertEqual(self.search('footer'), [])
+        Comment.objects.create(issue=issue, author=self.author, description='Header fixed')
+        issue.delete()
+        self.assertEqual(self.search('header'), [])
+
+    def search_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM projects_search')
+            return cursor.fetchone()[0]
+
+    def test_index_created_rows_in_two_queries(self):
+        issue = self.create_issue('Indexed')
+        with CaptureQueriesContext(connection) as context:
+            Comment.objects.create(issue=issue, author=self.author, description='Indexed too')
+        self.assertEqual(len([query for query in context.captured_queries if 'search' in query['sql']]), 2)
+        self.assertEqual(len(self.search('indexed')), 2)
+
+    def test_cascade_delete_drops_the_text_in_bulk(self):
+        for index in range(3):
+            issue = self.create_issue(f'Cascade {index}')
+            Comment.objects.create(issue=issue, author=self.author, description='Cascade comment')
+        self.assertEqual(self.search_rows(), 6)
+        with CaptureQueriesContext(connection) as context:
+            self.project.delete()
+        # One DELETE of documents per foreign key, whatever the number of documents
+        self.assertEqual(len([query for query in context.captured_queries if 'search' in query['sql']]), 3)
+        self.assertEqual(self.search_rows(), 0)
+
+    def test_search_indexes_bulk_created_issues(self):
+        response = self.client.post(reverse('issue-bulk', kwargs={'project_pk': self.project.id}), [
+            {'title': 'Bulk imported', 'description': 'First', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search('imported'), [('issue', response.data[0]['id'])])
+
+    def test_search_requires_contributor(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.outsider).access_token))
+        self.assertEqual(self.client.get(self.url, {'q': 'login'}).status_code, 403)
+
+    def test_search_requires_query(self):
+        self.assertEqual(self.client.get(self.url, {'q': ' '}).status_code, 400)
+        self.assertEqual(self.search('"*('), [])
+
+    def test_rebuild_search_index(self):
+        issue = self.create_issue('Rebuilt issue')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM projects_search')
+        self.assertEqual(self.search('rebuilt'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('rebuilt'), [('issue', issue.id)])
+
+
+@override_settings(ROOT_URLCONF='softdesk.asgi_urls')
+class AsyncReadTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.outsider = User.objects.create_user(username='outsider', password='password')
+        self.project = Project.objects.create(name='Async', description='', type='back-end', author=self.user)
+        self.author = Contributor.objects.get(user=self.user, project=self.project)
+        self.issues = [
+            Issue.objects.create(project=self.project, author=self.author, title=f'Issue {index}', description='',
+                                 status='to-do', priority='low', tag=tag)
+            for index, tag in enumerate(['bug', 'task', 'bug'])
+        ]
+        self.comment = Comment.objects.create(issue=self.issues[0], author=self.author, description='First')
+        self.headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.user).access_token)}
+
+    async def test_retrieve_project(self):
+        response = await self.async_client.get(reverse('project-detail', args=[self.project.id]), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['author'], 'testuser')
+        self.assertEqual(data['contributors'], ['testuser'])
+        self.assertEqual(data['issues'], ['Issue 0', 'Issue 1', 'Issue 2'])
+
+    async def test_list_issues_with_filters_and_fieldset(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        response = await self.async_client.get(url, {'tag': 'bug', 'fields': 'id,title', 'ordering': '-created_time', 'limit': 1}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(response.json()['results'], [{'id': self.issues[2].id, 'title': 'Issue 2'}])
+
+    async def test_list_issues_with_cursor_pagination(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        response = await self.async_client.get(url, {'pagination': 'cursor', 'page_size': 2}, headers=self.headers)
+        # The comment touched the first issue, now the most recently updated
+        self.assertEqual([issue['id'] for issue in response.json()['results']], [self.issues[0].id, self.issues[2].id])
+        self.assertIsNotNone(response.json()['next'])
+
+    async def test_retrieve_comment(self):
+        url = reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': self.issues[0].id, 'pk': self.comment.id})
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.json()['description'], 'First')
+        etag = response['ETag']
+        response = await self.async_client.get(url, headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        missing_url = reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': self.issues[1].id, 'pk': self.comment.id})
+        self.assertEqual((await self.async_client.get(missing_url, headers=self.headers)).status_code, 404)
+
+    async def test_permissions(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.outsider).access_token)}
+        self.assertEqual((await self.async_client.get(url, headers=headers)).status_code, 403)
+        self.assertEqual((await self.async_client.get(url, {'fields': 'secret'}, headers=self.headers)).status_code, 400)
+
+    async def test_writes_go_to_the_sync_views(self):
+        url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        response = await self.async_client.post(url, {'title': 'Created', 'description': 'Created', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'},
+                                                content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.get(url, {'fields': 'title'}, headers=self.headers)
+        self.assertEqual(response.json()['count'], 4)
+
+
+class EventsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        broker.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.member = User.objects.create_user(username='member', password='password')
+        self.outsider = User.objects.create_user(username='outsider', password='password')
+        self.project = Project.objects.create(name='Events', description='', type='back-end', author=self.user)
+        self.author = Contributor.objects.get(user=self.user, project=self.project)
+        self.issue = Issue.objects.create(project=self.project, author=self.author, title='Existing', description='Existing',
+                                          status='to-do', priority='low', tag='bug')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.user).access_token))
+        self.url = reverse('project-events', args=[self.project.id])
+        self.issues_url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+
+    def parse(self, chunks):
+        """(id, event, data) of the events in the chunks, keepalives as (None, 'keepalive', None)."""
+        events = []
+        for block in b''.join(chunks).decode().split('\n\n'):
+            if block.startswith(': keepalive'):
+                events.append((None, 'keepalive', None))
+                continue
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+            if 'event' in fields:
+                events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+        return events
+
+    def create_issue(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.issues_url, {'title': title, 'description': title, 'status': 'to-do', 'priority': 'low', 'tag': 'bug'})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    @override_settings(EVENTS_STREAM_SECONDS=5)
+    def test_stream_issue_and_comment_events(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+
+        issue_id = self.create_issue('Created')
+        comments_url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': issue_id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': issue_id}), {'status': 'in-progress'})
+            comment_id = self.client.post(comments_url, {'description': 'Comment'}).data['id']
+            self.client.delete(reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': issue_id, 'pk': comment_id}))
+            self.client.delete(reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': issue_id}))
+        events = self.parse([next(chunks) for _ in range(5)])
+        response.close()
+
+        self.assertEqual([event for _, event, _ in events], ['issue.created', 'issue.updated', 'comment.created', 'comment.deleted', 'issue.deleted'])
+        self.assertEqual(events[0][2]['title'], 'Created')
+        self.assertEqual(events[1][2]['status'], 'in-progress')
+        self.assertEqual(events[2][2], {'id': str(comment_id), 'issue': issue_id, 'project': self.project.id, 'created_time': events[2][2]['created_time']})
+        self.assertEqual(len({event_id for event_id, _, _ in events}), 5)
+        self.assertFalse(broker._subscribers)
+
+    @override_settings(EVENTS_STREAM_SECONDS=0)
+    def test_resume_after_last_event_id(self):
+        self.create_issue('First')
+        second = self.create_issue('Second')
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.filter(pk=second).delete()
+        first_id = self.parse(self.client.get(self.url, {'last_event_id': f'{broker.epoch}-0'}).streaming_content)[0][0]
+
+        events = self.parse(self.client.get(self.url, HTTP_LAST_EVENT_ID=first_id).streaming_content)
+        self.assertEqual([(event, data['id']) for _, event, data in events], [('issue.created', second), ('issue.deleted', second)])
+        # No event missed since the last one
+        self.assertEqual(self.parse(self.client.get(self.url, HTTP_LAST_EVENT_ID=events[-1][0]).streaming_content), [])
+
+    @override_settings(EVENTS_STREAM_SECONDS=0, EVENTS_HISTORY_SIZE=2)
+    def test_reset_when_the_history_lost_events(self):
+        first_id = None
+        for title in ['First', 'Second', 'Third']:
+            self.create_issue(title)
+            if first_id is None:
+                first_id = broker.event_id(broker._seq)
+        # The first event left the history but the client already had it
+        events = self.parse(self.client.get(self.url, HTTP_LAST_EVENT_ID=first_id).streaming_content)
+        self.assertEqual([data['title'] for _, _, data in events], ['Second', 'Third'])
+        events = self.parse(self.client.get(self.url, HTTP_LAST_EVENT_ID=f'{broker.epoch}-0').streaming_content)
+        self.assertEqual([event for _, event, _ in events], ['reset'])
+        # The reset carries the current position
+        self.assertEqual(events[0][0], broker.event_id(broker._seq))
+        # Ids of another process (before a restart) can not be resumed either
+        events = self.parse(self.client.get(self.url, HTTP_LAST_EVENT_ID='0-1').streaming_content)
+        self.assertEqual([event for _, event, _ in events], ['reset'])
+
+    @override_settings(EVENTS_STREAM_SECONDS=5, EVENTS_CLIENT_BUFFER_SIZE=2)
+    def test_slow_client_is_disconnected_on_overflow(self):
+        response = self.client.get(self.url)
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        for index in range(3):
+            broker.publish(self.project.id, 'issue.updated', {'id': index})
+        events = self.parse(chunks)
+        self.assertEqual([(event, data.get('id')) for _, event, data in events], [('issue.updated', 0), ('issue.updated', 1), ('overflow', None)])
+        # Without id, the client resumes after the last event it received
+        self.assertIsNone(events[-1][0])
+        self.assertFalse(broker._subscribers)
+
+    def test_rolled_back_writes_are_not_published(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Issue.objects.create(project=self.project, author=self.author, title='Rolled back', description='',
+                                     status='to-do', priority='low', tag='bug')
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(broker._history, {})
+
+    @override_settings(EVENTS_STREAM_SECONDS=5, EVENTS_KEEPALIVE_SECONDS=0.01)
+    def test_stream_ends_when_the_user_leaves_the_project(self):
+        contributor = Contributor.objects.create(user=self.member, project=self.project)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.member).access_token))
+        response = self.client.get(self.url)
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        self.assertEqual(next(chunks), b': keepalive\n\n')
+        contributor.delete()
+        self.assertEqual(list(chunks), [])
+
+    def test_permissions(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.outsider).access_token))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content.startswith(b'event: error\n'))
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(EVENTS_STREAM_SECONDS=5)
+    def test_project_deletion_ends_the_stream(self):
+        response = self.client.get(self.url)
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('project-detail', args=[self.project.id]))
+        # The issue and comments deleted in cascade send no event of their own
+        self.assertEqual([event for _, event, _ in self.parse(chunks)], ['project.deleted'])
+
+    @override_settings(EVENTS_STREAM_SECONDS=0)
+    async def test_asgi_stream(self):
+        await sync_to_async(self.create_issue)('Created')
+        headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.user).access_token),
+                   'Last-Event-ID': f'{broker.epoch}-0'}
+        response = await self.async_client.get(self.url, headers=headers)
+        self.assertTrue(response.is_async)
+        events = self.parse([chunk async for chunk in response.streaming_content])
+        self.assertEqual([(event, data['title']) for _, event, data in events], [('issue.created', 'Created')])
+
+
+class SyncTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.member = User.objects.create_user(username='member', password='password')
+        self.outsider = User.objects.create_user(username='outsider', password='password')
+        self.login(self.user)
+        response = self.client.post(reverse('project-list'), {'name': 'Sync', 'description': 'desc', 'type': 'ios', 'contributors': ['member']}, format='json')
+        self.project = Project.objects.get(pk=response.data['id'])
+        self.other_project = Project.objects.create(name='Other', description='', type='ios', author=self.outsider)
+        self.issues_url = reverse('issue-list', kwargs={'project_pk': self.project.id})
+        self.issue_id = self.client.post(self.issues_url, {'title': 'Issue', 'description': 'Issue', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'}).data['id']
+        self.comments_url = reverse('comment-list', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue_id})
+        self.comment_id = self.client.post(self.comments_url, {'description': 'Comment'}).data['id']
+        self.url = reverse('sync-list')
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(user).access_token))
+
+    def sync(self, since=0, **params):
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_sync_from_zero_returns_the_projects_of_the_user(self):
+        data = self.sync()
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.id])
+        self.assertEqual(data['projects'][0]['contributors'], ['testuser', 'member'])
+        self.assertEqual(sorted((contributor['user'], contributor['project']) for contributor in data['contributors']),
+                         [('member', self.project.id), ('testuser', self.project.id)])
+        self.assertEqual([(issue['id'], issue['project'], issue['comments_count']) for issue in data['issues']], [(self.issue_id, self.project.id, 1)])
+        self.assertEqual([str(comment['id']) for comment in data['comments']], [str(self.comment_id)])
+        self.assertFalse(data['more'])
+        self.assertEqual(data['deleted'], {'projects': [], 'contributors': [], 'issues': [], 'comments': []})
+        self.assertEqual(self.sync(data['next'])['issues'], [])
+
+    def test_sync_returns_only_the_changes_since(self):
+        since = self.sync()['next']
+        self.client.patch(reverse('issue-detail', kwargs={'project_pk': self.project.id, 'pk': self.issue_id}), {'status': 'finished'})
+        self.client.delete(reverse('comment-detail', kwargs={'project_pk': self.project.id, 'issue_pk': self.issue_id, 'pk': self.comment_id}))
+        data = self.sync(since)
+        self.assertEqual(data['projects'], [])
+        self.assertEqual([(issue['status'], issue['comments_count']) for issue in data['issues']], [('finished', 0)])
+        self.assertEqual(data['deleted']['comments'], [str(self.comment_id)])
+        self.assertGreater(data['next'], since)
+
+    def test_bulk_writes_are_logged(self):
+        since = self.sync()['next']
+        url = reverse('issue-bulk', kwargs={'project_pk': self.project.id})
+        data = [{'title': f'Bulk {index}', 'description': 'Bulk', 'status': 'to-do', 'priority': 'low', 'tag': 'bug'} for index in range(3)]
+        created = [issue['id'] for issue in self.client.post(url, data, format='json').data]
+        self.client.patch(url, [{'id': created[0], 'title': 'Renamed'}], format='json')
+        data = self.sync(since)
+        self.assertEqual(sorted((issue['id'], issue['title']) for issue in data['issues']),
+                         [(created[0], 'Renamed'), (created[1], 'Bulk 1'), (created[2], 'Bulk 2')])
+        self.assertEqual(ChangeLog.objects.filter(seq__gt=since, model='issue').count(), 4)
+
+    def test_pages_of_changes(self):
+        first = self.sync(limit=2)
+        self.assertTrue(first['more'])
+        rest = self.sync(first['next'])
+        self.assertFalse(rest['more'])
+        everything = self.sync()
+        self.assertEqual(len(first['projects']) + len(rest['projects']), len(everything['projects']))
+        self.assertEqual(
+            {str(comment['id']) for comment in first['comments'] + rest['comments']},
+            {str(comment['id']) for comment in everything['comments']},
+        )
+
+    def test_members_are_told_the_projects_they_joined_and_left(self):
+        self.login(self.member)
+        since = self.sync()['next']
+        self.login(self.user)
+        self.client.put(reverse('project-detail', args=[self.project.id]),
+                        {'name': 'Sync', 'description': 'desc', 'type': 'ios', 'contributors': ['outsider']}, format='json')
+        self.login(self.member)
+        data = self.sync(since)
+        self.assertEqual(data['deleted']['projects'], [self.project.id])
+        self.assertEqual(data['issues'], [])
+
+        since = data['next']
+        self.login(self.user)
+        self.client.put(reverse('project-detail', args=[self.project.id]),
+                        {'name': 'Sync', 'description': 'desc', 'type': 'ios', 'contributors': ['member']}, format='json')
+        self.login(self.member)
+        # Joined again after the project was created: its older rows are not in the window
+        self.assertEqual(self.sync(since)['reload'], [self.project.id])
+
+    def test_project_deletion(self):
+        self.login(self.member)
+        since = self.sync()['next']
+        self.login(self.user)
+        self.client.delete(reverse('project-detail', args=[self.project.id]))
+        self.login(self.member)
+        data = self.sync(since)
+        self.assertEqual(data['deleted']['projects'], [self.project.id])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class QueryBudgetTest(APITestCase):
+
+    def measure_size(self, size):
+        with transaction.atomic():
+            results = measure_routes(seed(size))
+            transaction.set_rollback(True)
+        return results
+
+    def test_routes_within_query_budgets(self):
+        budgets = load_budgets()
+        small = self.measure_size(5)
+        large = self.measure_size(40)
+        self.assertEqual(check_budgets(small, budgets), [])
+        self.assertEqual(check_budgets(large, budgets), [])
+        for name, result in small.items():
+            self.assertEqual(result['queries'], large[name]['queries'], name)
+
+    def test_routes_avoid_full_table_scans(self):
+        with transaction.atomic():
+            scans = find_full_scans(seed(10))
+            transaction.set_rollback(True)
+        self.assertEqual(scans, [])
+
+
+class ProfilingTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        route_profiles.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.project = Project.objects.create(name='Profiled', description='', type='back-end', author=self.user)
+        self.headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.user).access_token)}
+        self.staff_headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.staff).access_token)}
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('project-detail', args=[self.project.id]), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = self.server_timing(response)
+        for phase in ('auth', 'permission', 'queryset', 'serialize', 'render', 'db', 'total'):
+            self.assertIn(phase, metrics)
+        self.assertEqual(metrics['db']['desc'], f'"{len(context.captured_queries)} queries"')
+        phases = sum(float(metric['dur']) for name, metric in metrics.items() if name != 'total')
+        self.assertAlmostEqual(phases, float(metrics['total']['dur']), delta=0.1)
+
+    @override_settings(ROOT_URLCONF='softdesk.asgi_urls')
+    async def test_server_timing_header_on_the_async_read_path(self):
+        response = await self.async_client.get(reverse('issue-list', kwargs={'project_pk': self.project.id}), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = self.server_timing(response)
+        for phase in ('auth', 'permission', 'queryset', 'serialize', 'render', 'db'):
+            self.assertIn(phase, metrics)
+
+    def test_route_aggregate_for_staff(self):
+        url = reverse('project-list')
+        for _ in range(3):
+            self.client.get(url, headers=self.headers)
+        self.client.post(url, {'name': 'Other', 'description': '', 'type': 'back-end'}, format='json', headers=self.headers)
+
+        profiling_url = reverse('profiling')
+        self.assertEqual(self.client.get(profiling_url, headers=self.headers).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(profiling_url, headers=self.staff_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = response.json()['routes']
+        self.assertEqual(routes['GET project-list']['requests'], 3)
+        self.assertEqual(routes['POST project-list']['requests'], 1)
+        self.assertIn(routes['GET project-list']['dominant_phase'], routes['GET project-list']['phases_ms'])
+        self.assertGreater(routes['POST project-list']['queries'], 0)
+
+        with override_settings(PROFILING_WINDOW=2):
+            route_profiles.clear()
+            for _ in range(3):
+                self.client.get(url, headers=self.headers)
+            routes = self.client.get(profiling_url, headers=self.staff_headers).json()['routes']
+        self.assertEqual((routes['GET project-list']['requests'], routes['GET project-list']['window']), (3, 2))
+
+        self.assertEqual(self.client.delete(profiling_url, headers=self.staff_headers).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(self.client.get(profiling_url, headers=self.staff_headers).json()['routes']), ['DELETE profiling'])
+
+
+class MetricsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.headers = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.user).access_token)}
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        project = Project.objects.create(name='Metrics', description='', type='back-end', author=self.user)
+        url = reverse('issue-list', kwargs={'project_pk': project.id})
+        labels = {'route': 'issue-list', 'method': 'GET', 'action': 'list'}
+        before = {
+            'requests': self.sample('softdesk_http_requests_total', status='200', **labels),
+            'latency': self.sample('softdesk_http_request_duration_seconds_count', **labels),
+            'queries': self.sample('softdesk_db_queries_per_request_sum', **labels),
+            'pages': self.sample('softdesk_pagination_page_size_count', route='issue-list', action='list'),
+        }
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, headers=self.headers)
+        self.assertEqual(self.sample('softdesk_http_requests_total', status='200', **labels), before['requests'] + 1)
+        self.assertEqual(self.sample('softdesk_http_request_duration_seconds_count', **labels), before['latency'] + 1)
+        self.assertEqual(self.sample('softdesk_db_queries_per_request_sum', **labels), before['queries'] + len(context.captured_queries))
+        self.assertEqual(self.sample('softdesk_pagination_page_size_count', route='issue-list', action='list'), before['pages'] + 1)
+
+    def test_jwt_outcomes_and_signal_timings(self):
+        outcomes = ('authenticated', 'no_token', 'invalid_token')
+        before = {outcome: self.sample('softdesk_jwt_authentications_total', outcome=outcome) for outcome in outcomes}
+        signals = self.sample('softdesk_signal_handler_duration_seconds_count', handler='add_author_as_contributor')
+        url = reverse('project-list')
+        response = self.client.post(url, {'name': 'Timed', 'description': 'Timed', 'type': 'back-end'}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.get(url)
+        self.client.get(url, headers={'Authorization': 'Bearer invalid'})
+        for outcome in outcomes:
+            self.assertEqual(self.sample('softdesk_jwt_authentications_total', outcome=outcome), before[outcome] + 1, outcome)
+        self.assertEqual(self.sample('softdesk_signal_handler_duration_seconds_count', handler='add_author_as_contributor'), signals + 1)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('softdesk_jwt_authentications_total{outcome="invalid_token"}', response.content.decode())
+
+    def test_metrics_of_several_processes(self):
+        # Two "workers" write their values to the shared directory, /metrics adds them up
+        script = (
+            'import django; django.setup(); from projects import metrics; '
+            'metrics.count_jwt(metrics.AUTHENTICATED); metrics.count_cache_lookup("users", None)'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory, 'DJANGO_SETTINGS_MODULE': 'softdesk.settings'}
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR, check=True)
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('softdesk_jwt_authentications_total{outcome="authenticated"} 2.0', content)
+        self.assertIn('softdesk_cache_lookups_total{cache="users",result="miss"} 2.0', content)
+
+
+class SeedDataTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        project_response_cache.clear()
+
+    def test_generate_applies_the_signal_effects(self):
+        counts = generate(users=30, projects=8, issues=60, comments=300, max_contributors=10)
+        self.assertEqual((counts['user'], counts['project'], counts['issue'], counts['comment']), (30, 8, 60, 300))
+        self.assertEqual(Contributor.objects.count(), counts['contributor'])
+        self.assertEqual(Issue.assignees.through.objects.count(), counts['assignee'])
+        for project in Project.objects.all():
+            self.assertTrue(Contributor.objects.filter(project=project, user=project.author).exists())
+        for issue in Issue.objects.all():
+            self.assertEqual(issue.comments_count, issue.comments.count())
+            self.assertEqual(issue.author.project_id, issue.project_id)
+            self.assertFalse(issue.assignees.exclude(project=issue.project).exists())
+            # The issue was updated by its last comment
+            latest = issue.comments.aggregate(latest=Max('created_time'))['latest']
+            if latest is not None:
+                self.assertGreaterEqual(issue.updated_time, latest)
+        self.assertEqual(ChangeLog.objects.filter(model='comment').count(), 300)
+        self.assertEqual(ChangeLog.objects.filter(model='issue').count(), 60)
+
+    def test_generate_is_deterministic(self):
+        generate(users=10, projects=4, issues=20, comments=50, prefix='a', seed=3)
+        generate(users=10, projects=4, issues=20, comments=50, prefix='b', seed=3)
+
+        def shape(prefix):
+            return [
+                (issue.title, issue.comments_count, issue.assignees.count())
+                for issue in Issue.objects.filter(project__author__username__startswith=prefix).order_by('pk')
+            ]
+        self.assertEqual(shape('a-'), shape('b-'))
+
+    def test_seed_data_command(self):
+        out = io.StringIO()
+        call_command('seed_data', users=5, projects=2, issues=4, comments=6, stdout=out)
+        self.assertIn('comment: 6', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=5, projects=2, issues=4, comments=6, stdout=io.StringIO())
+
+
+class LoadMixTest(APITestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('issue-list=5, comment-create'), {'issue-list': 5.0, 'comment-create': 1.0})
+        for text in ('nope=1', 'issue-list=x', 'issue-list=-1', 'issue-list=0', ''):
+            with self.assertRaises(ValueError):
+                parse_mix(text)
+        # Writing to the target database is opt-in
+        self.assertFalse(set(DEFAULT_MIX) & set(WRITE_ROUTES))
+
+    def test_plan_mix(self):
+        generate(users=10, projects=3, issues=30, comments=100, max_contributors=5)
+        targets = load_targets(3, random.Random(0))
+        plans = plan_mix(targets, {'issue-detail': 1, 'comment-list': 1, 'comment-create': 1}, requests=25, concurrency=4)
+        self.assertEqual(sorted(len(calls) for headers, calls in plans), [6, 6, 6, 7])
+        calls = [call for headers, calls in plans for call in calls]
+        self.assertEqual({call.label for call in calls}, {'issue-detail', 'comment-list', 'comment-create'})
+        for call in calls:
+            self.assertEqual(call.method, 'post' if call.label == 'comment-create' else 'get')
+            self.assertIn('/comments/' if call.label.startswith('comment') else '/issues/', call.url)
+        # The calls of a client use the JWT of its target
+        headers, calls = plans[0]
+        response = self.client.get(next(call.url for call in calls if call.method == 'get'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_report(self):
+        samples = [('a', 0.010, 200), ('a', 0.030, 200), ('b', 0.020, 500)]
+        results = report(samples, elapsed=2.0)
+        self.assertEqual(set(results), {'a', 'b', 'total'})
+        self.assertEqual(results['a']['requests'], 2)
+        self.assertEqual(results['a']['p50_ms'], 10.0)
+        self.assertEqual(results['b']['errors'], 1)
+        self.assertEqual(results['total']['requests'], 3)
+        self.assertEqual(results['total']['throughput_rps'], 1.5)
@@ -1,9 +1,33 @@
-from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import IsAuthenticated, AllowAny
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.renderers import JSONRenderer
+from django_filters.rest_framework import DjangoFilterBackend
 
 from projects.models import Project, Contributor, Issue, Comment
 from projects.serializers import *
 from projects.permissions import IsAuthor, IsProjectContributor
+from projects.membership import get_contributor
+from projects.response_cache import project_response_cache
+from projects.filters import IssueFilter, CommentFilter, StableOrderingFilter
+from projects.pagination import IssueCursorPagination, CommentCursorPagination
+from projects.renderers import NDJSONRenderer, CSVRenderer, EventStreamRenderer, streaming_response
+from projects.export import ndjson_lines, csv_lines, andjson_lines, acsv_lines
+from projects import changelog, search
+from projects import events, profiling
 
 
 class MultipleSerializerMixin:
@@ -16,35 +40,437 @@ class MultipleSerializerMixin:
         return super().get_serializer_class()
 
 
-class ProjectViewset(MultipleSerializerMixin ,ModelViewSet):
+class ProfilingMixin:
+    """
+    Times the phases of the view for the ProfilingMiddleware (see
+    projects/profiling.py). Goes first, to time the other mixins.
+    """
+
+    def perform_authentication(self, request):
+        with profiling.phase(profiling.AUTH):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with profiling.phase(profiling.PERMISSION):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with profiling.phase(profiling.PERMISSION):
+            super().check_object_permissions(request, obj)
+
+    def get_object(self):
+        with profiling.phase(profiling.QUERYSET):
+            return super().get_object()
+
+    def paginate_queryset(self, queryset):
+        with profiling.phase(profiling.QUERYSET):
+            page = super().paginate_queryset(queryset)
+        profiling.record_page(page)
+        return page
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # The action runs next
+        profiling.switch(profiling.SERIALIZE)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        profiling.switch(profiling.RENDER)
+        if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(end_render)
+        return response
+
+
+def end_render(response):
+    profiling.switch(profiling.OTHER)
+
+
+class AtomicWriteMixin:
+    """
+    Runs the writes in a transaction, which also holds the change log
+    entries written by their signals (see projects/changelog.py).
+    """
+
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
+
+
+class QueryPlanMixin:
+    """
+    Applies the query plan declared for the current action so that a page
+    costs a fixed number of queries whatever its size.
+
+    `query_plans` maps an action name (or 'default') to a dict with the
+    optional keys 'select_related', 'prefetch_related' and 'only'.
+    """
+
+    query_plans = {}
+
+    def get_query_plan(self):
+        return self.query_plans.get(self.action, self.query_plans.get('default', {}))
+
+    def apply_query_plan(self, queryset):
+        plan = self.get_query_plan()
+        if plan.get('select_related'):
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        if plan.get('only'):
+            queryset = queryset.only(*plan['only'])
+        return queryset
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets: `?fields=id,title` on list and retrieve makes the
+    serializer emit only these fields and narrows the query plan to what
+    they need. `field_plans` gives the plan of the fields needing more than
+    their own column, `fieldset_base_plan` what is always loaded (primary
+    key, columns read by the permissions). Goes before QueryPlanMixin.
+    """
+
+    field_plans = {}
+    fieldset_base_plan = {'only': ('id',)}
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_requested_fields(self):
+        if self.action not in self.fieldset_actions:
+            return None
+        value = self.request.query_params.get('fields', '')
+        return {name.strip() for name in value.split(',') if name.strip()} or None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.check_requested_fields()
+
+    def check_requested_fields(self):
+        fields = self.get_requested_fields()
+        if fields:
+            serializer_fields = self.get_serializer_class()(context={}).fields
+            unknown_fields = fields - {name for name, field in serializer_fields.items() if not field.write_only}
+            if unknown_fields:
+                raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown_fields))}"})
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
+
+    def get_query_plan(self):
+        fields = self.get_requested_fields()
+        if not fields:
+            return super().get_query_plan()
+
+        plan = {'select_related': [], 'prefetch_related': [], 'only': []}
+
+        def add(field_plan):
+            for key, values in field_plan.items():
+                plan[key] += [value for value in values if value not in plan[key]]
+
+        add(self.fieldset_base_plan)
+        # Cursor pagination reads its ordering fields on the last row of the page
+        ordering = getattr(self.paginator, 'ordering', ())
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        for backend in self.filter_backends:
+            if hasattr(backend, 'get_ordering'):
+                ordering += backend().get_ordering(self.request, None, self) or []
+        add({'only': [name.lstrip('-') for name in ordering]})
+        for name in sorted(fields):
+            add(self.field_plans.get(name, {'only': (name,)}))
+        return plan
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination: `?pagination=cursor` (or a `cursor` from a
+    previous page) switches from the default LimitOffsetPagination to
+    `cursor_pagination_class`, avoiding the OFFSET scan and the COUNT(*).
+    """
+
+    cursor_pagination_class = None
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return self.cursor_pagination_class is not None and (params.get('pagination') == 'cursor' or 'cursor' in params)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve. The validators come
+    from a cheap aggregate returned by `get_conditional_state()`, so an
+    unchanged resource is answered with a 304 before any serialization.
+
+    The fingerprint covers everything the response shows. The usernames
+    have no modification time: the list and project fingerprints carry the
+    project response cache version instead, bumped on every membership
+    write and user rename, so a rename changes the ETag but not the
+    Last-Modified.
+    """
+
+    def get_conditional_state(self):
+        """
+        Return (last_modified, fingerprint) describing the current state of
+        the resource, or None to serve the request unconditionally.
+        """
+        return None
+
+    async def aget_conditional_state(self):
+        """get_conditional_state() for the async views, run in the database thread."""
+        return await sync_to_async(self.get_conditional_state)()
+
+    def get_validators(self, request, state):
+        """Return the (etag, last modified timestamp) of a conditional state."""
+        last_modified, fingerprint = state
+        digest = hashlib.md5(f'{request.get_full_path()}|{fingerprint}'.encode()).hexdigest()
+        return quote_etag(digest), int(last_modified.timestamp()) if last_modified else None
+
+    def set_validators(self, response, etag, timestamp):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        try:
+            state = self.get_conditional_state()
+        except (DjangoValidationError, ValueError):
+            state = None
+        if state is None:
+            return handler(request, *args, **kwargs)
+
+        etag, timestamp = self.get_validators(request, state)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self.set_validators(response, etag, timestamp)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class ProjectResponseCacheMixin:
+    """
+    Serves `response_cache_actions` from the project response cache. The
+    lookup happens inside the action, once the permissions of the request
+    have been checked, and the cached data is rendered again for every
+    request. Only the actions whose response is the same for every
+    contributor of the project may be listed.
+    """
+
+    response_cache_actions = ()
+    response_cache_project_kwarg = 'project_pk'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.response_cache_actions:
+            return handler(request, *args, **kwargs)
+
+        key = project_response_cache.key(self.kwargs[self.response_cache_project_kwarg], request.build_absolute_uri())
+        data = project_response_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            project_response_cache.set(key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+def aggregate_subquery(queryset, group_by, expression):
+    """Subquery computing `expression` over the `queryset` rows grouped by `group_by`."""
+    return Subquery(queryset.order_by().values(group_by).annotate(value=expression).values('value'))
+
+
+PROJECT_CONTRIBUTORS = Prefetch('contributors', queryset=User.objects.only('id', 'username'))
+PROJECT_ISSUES = Prefetch('issues', queryset=Issue.objects.only('id', 'project', 'title'))
+PROJECT_READ_FIELDS = ('id', 'name', 'description', 'type', 'created_time', 'author__id', 'author__username')
+ISSUE_READ_FIELDS = (
+    'id', 'title', 'description', 'status', 'priority', 'created_time', 'updated_time', 'comments_count',
+    'project__id', 'project__name', 'author__id', 'author__user__id', 'author__user__username',
+)
+COMMENT_READ_FIELDS = (
+    'id', 'description', 'created_time', 'issue__id', 'issue__project',
+    'author__id', 'author__user__id', 'author__user__username',
+)
+
+
+class ProjectViewset(ProfilingMixin, AtomicWriteMixin, SparseFieldsetMixin, QueryPlanMixin, ConditionalGetMixin, ProjectResponseCacheMixin, MultipleSerializerMixin ,ModelViewSet):
     serializer_class = ProjectListSerializer
     detail_serializer_class = ProjectDetailSerializer
+    response_cache_actions = ('retrieve',)
+    response_cache_project_kwarg = 'pk'
+    query_plans = {
+        'list': {
+            'select_related': ('author',),
+            'prefetch_related': (PROJECT_CONTRIBUTORS,),
+            'only': PROJECT_READ_FIELDS,
+        },
+        'retrieve': {
+            'select_related': ('author',),
+            'prefetch_related': (PROJECT_CONTRIBUTORS, PROJECT_ISSUES),
+            'only': PROJECT_READ_FIELDS,
+        },
+        'default': {
+            'select_related': ('author',),
+            'prefetch_related': (PROJECT_CONTRIBUTORS, PROJECT_ISSUES),
+        },
+    }
+    field_plans = {
+        'author': {'select_related': ('author',), 'only': ('author__id', 'author__username')},
+        'contributors': {'prefetch_related': (PROJECT_CONTRIBUTORS,)},
+        'issues': {'prefetch_related': (PROJECT_ISSUES,)},
+    }
 
     def get_permissions(self):
         match self.action:
             case 'list' | 'create':
                 self.permission_classes = [IsAuthenticated]
-            case 'retrieve':
+            case 'retrieve' | 'export' | 'search' | 'events':
                 self.permission_classes = [IsAuthenticated, IsProjectContributor]
             case _:
                 self.permission_classes = [IsAuthenticated, IsProjectContributor, IsAuthor]
         return super().get_permissions()
 
     def get_queryset(self):
-        return Project.objects.all()
+        return self.apply_query_plan(Project.objects.all())
+
+    def get_conditional_state(self):
+        if self.action != 'retrieve':
+            return None
+        issues = Issue.objects.filter(project=OuterRef('pk'))
+        contributors = Contributor.objects.filter(project=OuterRef('pk'))
+        state = Project.objects.filter(pk=self.kwargs['pk']).annotate(
+            issues_updated_time=aggregate_subquery(issues, 'project', Max('updated_time')),
+            issues_count=aggregate_subquery(issues, 'project', Count('pk')),
+            contributors_count=aggregate_subquery(contributors, 'project', Count('pk')),
+            last_contributor=aggregate_subquery(contributors, 'project', Max('pk')),
+        ).values_list('updated_time', 'issues_updated_time', 'issues_count', 'contributors_count', 'last_contributor').first()
+        if state is None:
+            return None
+        # The contributors and the author are shown by their username
+        return max(filter(None, state[:2])), (state, project_response_cache.version(self.kwargs['pk']))
+
+    @action(detail=True, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, pk=None):
+        """
+        Stream every issue of the project with its assignees and comments,
+        as NDJSON (default) or CSV with `?format=csv`.
+        """
+        renderer = request.accepted_renderer
+        lines, alines = (csv_lines, acsv_lines) if renderer.format == 'csv' else (ndjson_lines, andjson_lines)
+        response = streaming_response(request, lines, alines, pk, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="project-{pk}-issues.{renderer.format}"'
+        return response
+
+    search_max_results = 100
+
+    @action(detail=True, methods=['get'], url_path='search')
+    def search(self, request, pk=None):
+        """
+        Full-text search of `q` in the titles and descriptions of the issues
+        and the comments of the project, best matches first (`limit`, 20 by
+        default).
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': "Le paramètre q est requis."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.search_max_results)
+        except ValueError:
+            return Response({'detail': "limit doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = search.search(pk, query, max(limit, 1))
+        except search.Unavailable:
+            return Response({'detail': "La recherche nécessite SQLite FTS5."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'results': results})
+
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def events(self, request, pk=None):
+        """
+        Server-sent events of the issues and comments of the project (see
+        projects/events.py). Reconnecting clients resume after their
+        `Last-Event-ID` header, or `?last_event_id=`.
+        """
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        response = streaming_response(
+            request, events.stream, events.astream, int(pk), request.user.pk, last_event_id,
+            content_type='text/event-stream; charset=utf-8',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
     
 
-class ContributorViewset(MultipleSerializerMixin, ModelViewSet):
+class ContributorViewset(ProfilingMixin, AtomicWriteMixin, SparseFieldsetMixin, QueryPlanMixin, MultipleSerializerMixin, ModelViewSet):
     serializer_class = ContributorSerializer
     permission_classes = [AllowAny]
+    query_plans = {
+        'default': {
+            'select_related': ('user', 'project'),
+            'only': ('id', 'user__id', 'user__username', 'project__id', 'project__name'),
+        },
+    }
+    field_plans = {
+        'user': {'select_related': ('user',), 'only': ('user__id', 'user__username')},
+        'project': {'select_related': ('project',), 'only': ('project__id', 'project__name')},
+    }
 
     def get_queryset(self):
-        return Contributor.objects.all()
+        return self.apply_query_plan(Contributor.objects.all())
     
 
-class IssueViewset(MultipleSerializerMixin ,ModelViewSet):
+class IssueViewset(ProfilingMixin, AtomicWriteMixin, SparseFieldsetMixin, QueryPlanMixin, ConditionalGetMixin, ProjectResponseCacheMixin, CursorPaginationMixin, MultipleSerializerMixin ,ModelViewSet):
     serializer_class = IssueListSerializer
     detail_serializer_class = IssueDetailSerializer
+    cursor_pagination_class = IssueCursorPagination
+    response_cache_actions = ('list',)
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
+    filterset_class = IssueFilter
+    ordering_fields = ['updated_time', 'created_time']
+    # Most recently updated first, served by the (project, ..., updated_time) indexes
+    ordering = ['-updated_time', '-id']
+    query_plans = {
+        'list': {
+            'select_related': ('author__user', 'project'),
+            'only': ISSUE_READ_FIELDS,
+        },
+        'retrieve': {
+            'select_related': ('author__user', 'project'),
+            'only': ISSUE_READ_FIELDS,
+        },
+        'default': {
+            'select_related': ('author__user', 'project'),
+        },
+    }
+    field_plans = {
+        'project': {'select_related': ('project',), 'only': ('project__id', 'project__name')},
+        'author': {'select_related': ('author__user',), 'only': ('author__id', 'author__user__id', 'author__user__username')},
+    }
+    # project_id is read by the object permissions
+    fieldset_base_plan = {'only': ('id', 'project')}
     
     def get_permissions(self):
         match self.action:
@@ -56,16 +482,93 @@ class IssueViewset(MultipleSerializerMixin ,ModelViewSet):
 
     def get_queryset(self):
         project_pk = self.kwargs.get('project_pk')
-        return Issue.objects.filter(project_id=project_pk)
+        return self.apply_query_plan(Issue.objects.filter(project_id=project_pk))
+
+    def get_conditional_state(self):
+        # The issues show the name of their project and the username of their author
+        issues = Issue.objects.filter(project_id=self.kwargs['project_pk'])
+        if self.action == 'retrieve':
+            state = issues.filter(pk=self.kwargs['pk']).values_list(
+                'updated_time', 'project__updated_time', 'comments_count', 'author__user__username',
+            ).first()
+            return (max(state[:2]), state) if state else None
+        if self.action == 'list':
+            # comments_count changes on comment deletion without touching updated_time
+            state = issues.aggregate(
+                last=Max('updated_time'), project=Max('project__updated_time'), count=Count('pk'), comments=Sum('comments_count'),
+            )
+            last_modified = max(filter(None, (state['last'], state['project'])), default=None)
+            return last_modified, (state, project_response_cache.version(self.kwargs['project_pk']))
+        return None
 
     def perform_create(self, serializer):
         project_pk = self.kwargs.get('project_pk')
-        project = Project.objects.get(id=project_pk)
-        author = Contributor.objects.filter(user=self.request.user, project=project).first()
-        serializer.save(author=author, project=project)
+        # Membership already resolved by IsProjectContributor for this request
+        author = get_contributor(self.request, project_pk)
+        serializer.save(author=author, project_id=project_pk)
+
+    bulk_max_items = 1000
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request, project_pk=None):
+        """
+        POST a list of issues to create them, or PATCH a list of partial issues
+        with their `id` to update them, in a single transaction. Nothing is
+        written if any item is invalid, the errors are reported per item.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'detail': "Une liste d'issues est attendue."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.bulk_max_items:
+            return Response({'detail': f"{self.bulk_max_items} issues maximum par requête."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data, many=True)
+        else:
+            ids = [item.get('id') for item in request.data if isinstance(item, dict)]
+            issues = list(self.get_queryset().filter(pk__in=[issue_id for issue_id in ids if str(issue_id).isdigit()]))
+            serializer = self.get_serializer(issues, data=request.data, many=True, partial=True)
 
-class CommentViewset(MultipleSerializerMixin, ModelViewSet):
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = dict(enumerate(errors))
+            return Response(
+                {'errors': [{'index': index, 'errors': item_errors} for index, item_errors in errors.items() if item_errors]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if request.method == 'POST':
+            project = Project.objects.only('id', 'name').get(pk=project_pk)
+            serializer.save(author=get_contributor(request, project_pk), project=project)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer.save()
+        return Response(serializer.data)
+
+class CommentViewset(ProfilingMixin, AtomicWriteMixin, SparseFieldsetMixin, QueryPlanMixin, ConditionalGetMixin, CursorPaginationMixin, MultipleSerializerMixin, ModelViewSet):
     serializer_class = CommentSerializer
+    cursor_pagination_class = CommentCursorPagination
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
+    filterset_class = CommentFilter
+    ordering_fields = ['created_time']
+    query_plans = {
+        'list': {
+            'select_related': ('author__user', 'issue'),
+            'only': COMMENT_READ_FIELDS,
+        },
+        'retrieve': {
+            'select_related': ('author__user', 'issue'),
+            'only': COMMENT_READ_FIELDS,
+        },
+        'default': {
+            'select_related': ('author__user', 'issue'),
+        },
+    }
+    field_plans = {
+        'author': {'select_related': ('author__user',), 'only': ('author__id', 'author__user__id', 'author__user__username')},
+        'issue': {'only': ('issue',)},
+    }
+    # The object permissions read the project of the issue
+    fieldset_base_plan = {'select_related': ('issue',), 'only': ('id', 'issue__id', 'issue__project')}
 
     def get_permissions(self):
         match self.action:
@@ -78,13 +581,82 @@ class CommentViewset(MultipleSerializerMixin, ModelViewSet):
     def get_queryset(self):
         project_pk = self.kwargs['project_pk']
         issue_pk = self.kwargs['issue_pk']
-        return Comment.objects.filter(issue_id=issue_pk, issue__project_id=project_pk)
+        return self.apply_query_plan(Comment.objects.filter(issue_id=issue_pk, issue__project_id=project_pk))
+
+    def get_conditional_state(self):
+        comments = Comment.objects.filter(issue_id=self.kwargs['issue_pk'], issue__project_id=self.kwargs['project_pk'])
+        if self.action == 'retrieve':
+            state = comments.filter(pk=self.kwargs['pk']).values_list('updated_time', 'author__user__username').first()
+            return (state[0], state) if state else None
+        if self.action == 'list':
+            state = comments.aggregate(last=Max('updated_time'), count=Count('pk'))
+            return state['last'], (state, project_response_cache.version(self.kwargs['project_pk']))
+        return None
 
     def perform_create(self, serializer):
         project_pk = self.kwargs['project_pk']
         issue_pk = self.kwargs['issue_pk']
         issue = Issue.objects.get(pk=issue_pk, project_id=project_pk)
-        contributor = Contributor.objects.get(user=self.request.user, project_id=project_pk)
+        contributor = get_contributor(self.request, project_pk)
         serializer.save(author=contributor, issue=issue)
 
 
+class SyncViewset(ProfilingMixin, GenericViewSet):
+    """
+    Delta sync of the projects of the user from the change log:
+    `GET /api/sync/?since=<seq>` returns the current state of the rows
+    changed after `since` and the ids of the deleted ones, then `next` is
+    the `since` of the following call (0 downloads everything).
+    """
+    permission_classes = [IsAuthenticated]
+    sync_max_changes = 1000
+    sync_querysets = {
+        changelog.PROJECT: Project.objects.select_related('author').prefetch_related(PROJECT_CONTRIBUTORS).only(*PROJECT_READ_FIELDS),
+        changelog.CONTRIBUTOR: Contributor.objects.select_related('user').only('id', 'project_id', 'user__id', 'user__username'),
+        changelog.ISSUE: Issue.objects.select_related('author__user').only(
+            'id', 'project', 'title', 'description', 'status', 'priority', 'created_time', 'updated_time', 'comments_count',
+            'author__id', 'author__user__id', 'author__user__username',
+        ),
+        changelog.COMMENT: Comment.objects.select_related('author__user').only(
+            'id', 'issue', 'description', 'created_time', 'author__id', 'author__user__id', 'author__user__username',
+        ),
+    }
+    sync_serializers = {
+        changelog.PROJECT: ProjectListSerializer,
+        changelog.CONTRIBUTOR: ContributorSyncSerializer,
+        changelog.ISSUE: IssueSyncSerializer,
+        changelog.COMMENT: CommentSerializer,
+    }
+
+    def list(self, request):
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', self.sync_max_changes)), 1), self.sync_max_changes)
+        except ValueError:
+            return Response({'detail': "since et limit doivent être des entiers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = changelog.changes_since(request.user, since, limit)
+        data = {'since': since, 'next': changes['next'], 'more': changes['more']}
+        for model in changelog.MODELS:
+            ids = changes['changed'][model]
+            rows = self.sync_querysets[model].filter(pk__in=ids) if ids else []
+            # Rows deleted since their last entry are in a later page
+            data[f'{model}s'] = self.sync_serializers[model](rows, many=True, context=self.get_serializer_context()).data
+        data['deleted'] = {f'{model}s': changes['deleted'][model] for model in changelog.MODELS}
+        data['reload'] = changes['reload']
+        return Response(data)
+
+
+class ProfilingView(APIView):
+    """
+    Rolling aggregate of the request profiles per route (see
+    projects/profiling.py), for the staff: GET reads it, DELETE resets it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'window': settings.PROFILING_WINDOW, 'routes': profiling.route_profiles.summary()})
+
+    def delete(self, request):
+        profiling.route_profiles.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -3,6 +3,9 @@ ASGI config for softdesk project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The requests are resolved with softdesk.asgi_urls, whose read routes run on
+the event loop instead of a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -10,7 +13,22 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'softdesk.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'softdesk.asgi_urls'
+
+
+class SoftdeskASGIHandler(ASGIHandler):
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+# Sets Django up before the handler is created
+get_asgi_application()
+application = SoftdeskASGIHandler()
@@ -0,0 +1,35 @@
+"""
+URLconf of the ASGI application (see asgi.py). Same routes as urls.py, but
+GET on the router routes of ASYNC_READ_ROUTES is served by the async read
+views of projects.async_views.
+"""
+from django.urls import include, path, re_path
+
+from projects.async_views import async_read_view
+from softdesk import urls
+
+ASYNC_READ_ROUTES = {
+    'project-list': 'list',
+    'project-detail': 'retrieve',
+    'issue-list': 'list',
+    'issue-detail': 'retrieve',
+    'comment-list': 'list',
+    'comment-detail': 'retrieve',
+}
+
+
+def async_router_urls():
+    patterns = []
+    for pattern in urls.router.urls:
+        action = ASYNC_READ_ROUTES.get(pattern.name)
+        if action is not None:
+            view = async_read_view(pattern.callback.cls, action, pattern.callback)
+            pattern = re_path(pattern.pattern.regex.pattern, view, name=pattern.name)
+        patterns.append(pattern)
+    return patterns
+
+
+# Matched before the sync router routes of urls.py
+urlpatterns = [
+    path('api/', include(async_router_urls())),
+] + urls.urlpatterns
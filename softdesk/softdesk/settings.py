@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'projects.profiling.ProfilingMiddleware',
+    'projects.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,66 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# locmem is per process: use a shared backend (Redis, Memcached) in production
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Utilisateurs authentifiés par JWT, invalidés par les signaux du User
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Réponses de l'API par projet, clés versionnées par les signaux
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Durée de cache des appartenances (user, projet) -> contributor
+PROJECT_MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Durée de cache des réponses (détail projet, pages d'issues)
+PROJECT_RESPONSE_CACHE_TIMEOUT = 300
+
+# Fenêtre (secondes) pendant laquelle une issue n'est mise à jour qu'une fois
+# lors de rafales de commentaires, 0 pour désactiver
+ISSUE_TOUCH_COALESCE_SECONDS = 0
+
+# Server-sent events (projects/events.py) : évènements gardés par projet pour
+# la reprise avec Last-Event-ID, et tampon de chaque client
+EVENTS_HISTORY_SIZE = 1000
+EVENTS_CLIENT_BUFFER_SIZE = 100
+# Commentaire keepalive envoyé sans évènement, durée max d'un flux (le client
+# se reconnecte) et délai de reconnexion indiqué aux clients
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_STREAM_SECONDS = 300
+EVENTS_RETRY_MILLISECONDS = 3000
+
+# Profilage des requêtes (projects/profiling.py) : durée de chaque phase dans
+# l'en-tête Server-Timing, et agrégat des PROFILING_WINDOW dernières requêtes
+# de chaque route, lu par le staff sur /api/profiling/
+PROFILING_ENABLED = True
+PROFILING_SERVER_TIMING = True
+PROFILING_WINDOW = 1000
+
+# Métriques Prometheus sur /metrics (projects/metrics.py). Avec plusieurs
+# workers gunicorn, définir la variable d'environnement PROMETHEUS_MULTIPROC_DIR
+# (dossier vide au démarrage, partagé par les workers)
+METRICS_ENABLED = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
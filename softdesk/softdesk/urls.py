@@ -20,7 +20,8 @@ from rest_framework import routers
 from django.urls import path, include
 
 from authentication.views import UserViewset
-from projects.views import ProjectViewset, ContributorViewset, IssueViewset, CommentViewset, IssueViewset
+from projects.metrics import metrics_view
+from projects.views import ProjectViewset, ContributorViewset, IssueViewset, CommentViewset, IssueViewset, SyncViewset, ProfilingView
 
 router = routers.SimpleRouter()
 
@@ -29,6 +30,7 @@ router.register(r'contributors', ContributorViewset, basename='contributor')
 router.register(r'projects', ProjectViewset, basename='project')
 router.register(r'projects/(?P<project_pk>\d+)/issues', IssueViewset, basename='issue')
 router.register(r'projects/(?P<project_pk>\d+)/issues/(?P<issue_pk>\d+)/comments', CommentViewset, basename='comment')
+router.register(r'sync', SyncViewset, basename='sync')
 
 
 
@@ -38,10 +40,14 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('api/', include(router.urls)),
+    path('api/profiling/', ProfilingView.as_view(), name='profiling'),
 
     # Token
     path('api/login/', TokenObtainPairView.as_view(), name='login'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+
+    # Prometheus
+    path('metrics', metrics_view, name='metrics'),
     
 
 ]